@@ -1,10 +1,25 @@
 from __future__ import annotations
 
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, wait
+from contextlib import ExitStack, nullcontext
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
 from enum import Enum
-import random
-from typing import Dict, List
+import hashlib
+import heapq
+import itertools
+import secrets
+import time
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from doors import DoorQueue
+    from journal import LockerJournal
+    from metrics import LockerMetrics
+    from staff_registry import StaffRegistry
+    from throttle import PickupThrottle
 
 
 class AuthorizationError(Exception):
@@ -45,11 +60,18 @@ class Locker:
 @dataclass(frozen=True)
 class AccessToken:
     code: str
-    expiration_date: datetime
+    expires_at: int  # epoch seconds
     compartment: Locker
 
-    def is_expired(self) -> bool:
-        return datetime.now() >= self.expiration_date
+    @property
+    def expiration_date(self) -> datetime:
+        return datetime.fromtimestamp(self.expires_at)
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        # Pass `now` to check many tokens against one clock reading
+        if now is None:
+            now = time.time()
+        return now >= self.expires_at
 
     def get_compartment(self) -> Locker:
         return self.compartment
@@ -57,9 +79,107 @@ class AccessToken:
     def get_code(self) -> str:
         return self.code
     
+@dataclass(frozen=True)
+class BulkInsertFailure:
+    index: int  # position in the sizes list passed to insert_packages_bulk
+    size: Size
+    reason: str
+
+@dataclass
+class BulkInsertResult:
+    tokens: List[Optional[AccessToken]]  # same order as the input sizes, None where the package failed
+    failures: List[BulkInsertFailure]
+
 #Can change this whenever needed, as per new rules
 token_valid_days = 7
 
+
+class CodeAllocator(ABC):
+    """Hands out unique pickup codes and takes them back once a token is gone."""
+
+    @abstractmethod
+    def allocate(self) -> str:
+        ...
+
+    @abstractmethod
+    def release(self, code: str) -> None:
+        ...
+
+    @abstractmethod
+    def reserve(self, code: str) -> None:
+        """Mark a code as live without allocating it (used when tokens are restored after a restart)."""
+        ...
+
+
+class KeyedPermutationCodeAllocator(CodeAllocator):
+    """
+    Collision-free code allocator, O(1) per call at any occupancy.
+
+    - Fresh codes: a counter 0, 1, 2, ... pushed through a secret keyed permutation of [0, 10^code_length).
+      A permutation never repeats, so there is nothing to retry, and without the key the sequence looks random.
+      (Feistel rounds over the two halves of the digits, modular add keeps it a bijection on decimal codes.)
+    - Released codes: kept in a free list and handed out again (random pick) once the counter has used up the space.
+    """
+
+    _rounds = 4  # Luby-Rackoff: 4 Feistel rounds give a strong pseudorandom permutation
+
+    def __init__(self, code_length: int = 6, key: Optional[bytes] = None):
+        if code_length < 1:
+            raise ValueError("code_length must be at least 1")
+
+        self.code_length = code_length
+        self._keyed_hash = hashlib.blake2b(key=key if key is not None else secrets.token_bytes(16), digest_size=8)
+
+        self._left_mod = 10 ** (code_length // 2)
+        self._right_mod = 10 ** (code_length - code_length // 2)
+        self._space = self._left_mod * self._right_mod
+
+        self._next_index = 0
+        self._released: List[str] = []
+        # Restored codes the counter hasn't reached yet; each one is skipped once, so allocate stays amortized O(1)
+        self._reserved: Set[str] = set()
+
+    def allocate(self) -> str:
+        while self._next_index < self._space:
+            code = f"{self._permute(self._next_index):0{self.code_length}d}"
+            self._next_index += 1
+            if code in self._reserved:
+                self._reserved.discard(code)
+                continue
+            return code
+
+        if not self._released:
+            raise ValueError("No token codes available")
+
+        # Swap a random released code to the end and pop it (O(1), and reuse order stays unpredictable)
+        i = secrets.randbelow(len(self._released))
+        self._released[i], self._released[-1] = self._released[-1], self._released[i]
+        return self._released.pop()
+
+    def release(self, code: str) -> None:
+        # Released codes wait here until the counter has used up the fresh part of the space
+        self._released.append(code)
+
+    def reserve(self, code: str) -> None:
+        if len(code) != self.code_length or not code.isdigit():
+            raise ValueError(f"Invalid code for this allocator: {code!r}")
+        self._reserved.add(code)
+
+    def _permute(self, index: int) -> int:
+        left, right = divmod(index, self._right_mod)
+        for r in range(self._rounds):
+            if r % 2 == 0:
+                left = (left + self._round(r, right)) % self._left_mod
+            else:
+                right = (right + self._round(r, left)) % self._right_mod
+        return left * self._right_mod + right
+
+    def _round(self, r: int, half: int) -> int:
+        # Copying a pre-keyed hasher is much cheaper than re-keying blake2b every round
+        h = self._keyed_hash.copy()
+        h.update(r.to_bytes(1, "big") + half.to_bytes(16, "big"))
+        return int.from_bytes(h.digest(), "big")
+
 class LockerSystem:
     """
     Authorization rules:
@@ -67,81 +187,481 @@ class LockerSystem:
         - insert packages
         - access/open expired packages
     - Customers can pick up with valid + unexpired token
+
+    Thread safety (thread_safe=True):
+    - one lock per Size pool: guards that pool and the occupied flag of its lockers
+    - token locks striped by code (token_shards of them): guard claiming a token, so a pickup and an expiry sweep
+      can't both take the same one
+    - small leaf locks for the expiry heap (+ hour counts), the code allocator and the failed-door set
+      (held only for that call itself)
+    So an insert for SMALL never waits on a pickup from a LARGE locker. Nested locks always go size -> token ->
+    expiry/code; the expiry and code locks are leaves.
+    With thread_safe=False every lock is a no-op context manager.
     """
 
-    def __init__(self, lockers: List[Locker]):
+    def __init__(
+        self,
+        lockers: List[Locker],
+        code_allocator: Optional[CodeAllocator] = None,
+        thread_safe: bool = False,
+        token_shards: int = 16,
+        journal: Optional[LockerJournal] = None,
+        clock: Callable[[], float] = time.time,
+        door_queue: Optional[DoorQueue] = None,
+        allow_upgrade: bool = False,
+        staff_registry: Optional[StaffRegistry] = None,
+        pickup_throttle: Optional[PickupThrottle] = None,
+        metrics: Optional[LockerMetrics] = None,
+    ):
+        if token_shards < 1:
+            raise ValueError("token_shards must be at least 1")
+        if door_queue is not None and not thread_safe:
+            # Doors complete on the queue's worker threads, which then hand lockers back to the pools
+            raise ValueError("door_queue requires thread_safe=True")
+
         self.lockers: List[Locker] = lockers
+        # Epoch-seconds clock; injectable so sweeps/reports/tests can pin "now"
+        self._clock = clock
         # Store actual token objects by token code
         self._tokens_by_code: Dict[str, AccessToken] = {}
 
+        # 6-digit codes by default; pass another allocator to change length or strategy
+        self._code_allocator: CodeAllocator = code_allocator or KeyedPermutationCodeAllocator()
+
+        # Expiry index: min-heap of (expires_at, seq, token), so a sweep only pops what actually expired.
+        # Pickups don't search the heap; their entry goes stale and is skipped (or compacted away) later.
+        # seq breaks ties on equal expirations so tokens themselves are never compared.
+        self._expiry_heap: List[Tuple[int, int, AccessToken]] = []
+        self._expiry_seq = itertools.count()
+
+        # Free locker pools per size (stack behavior using list.pop()).
+        # insert pops from here instead of scanning self.lockers, so it stays O(1) however full the bank is.
+        self._free_lockers: Dict[Size, List[Locker]] = {size: [] for size in Size}
+        for locker in self.lockers:
+            if locker.is_empty():
+                self._free_lockers[locker.size].append(locker)
+
+        # Live aggregates for dashboards: lockers per size (occupied = total - free pool), and live tokens
+        # per expiry hour (expires_at // 3600), kept up to date on every add/remove under the expiry lock.
+        self._locker_count: Dict[Size, int] = {size: 0 for size in Size}
+        for locker in self.lockers:
+            self._locker_count[locker.size] += 1
+        self._expiry_hour_counts: Dict[int, int] = {}
+
+        self.thread_safe = thread_safe
+        new_lock = Lock if thread_safe else nullcontext
+        self._size_locks: Dict[Size, ContextManager] = {size: new_lock() for size in Size}
+        self._token_locks: List[ContextManager] = [new_lock() for _ in range(token_shards)]
+        self._expiry_lock: ContextManager = new_lock()
+        self._code_lock: ContextManager = new_lock()
+        self._failed_lock: ContextManager = new_lock()
+
+        # Lockers whose door failed to open after their token was cleared: still occupied and out of every pool
+        # until staff retry the door (retry_door) or empty the locker by hand (release_failed_locker).
+        # locker id -> Locker; journaled, so they are not handed out again after a restart.
+        self._failed_doors: Dict[str, Locker] = {}
+
+        # Size-upgrade policy: if the requested size is full, use the smallest larger size with room.
+        # Each tier is one O(1) pool check, never a rescan of self.lockers.
+        # upgrade_counts[(requested, used)] counts those fallbacks (only touched under the used size's lock).
+        self.allow_upgrade = allow_upgrade
+        size_order = list(Size)  # declared smallest -> largest
+        self._sizes_to_try: Dict[Size, List[Size]] = {
+            size: size_order[i:] if allow_upgrade else [size] for i, size in enumerate(size_order)
+        }
+        self.upgrade_counts: Dict[Tuple[Size, Size], int] = {
+            (requested, used): 0 for i, requested in enumerate(size_order) for used in size_order[i + 1:]
+        }
+
+        # Optional central staff check with cached decisions (see staff_registry.py).
+        # None means only Staff.is_valid() on the object the caller passes in.
+        self.staff_registry = staff_registry
+
+        # Optional brute-force guard on pickup codes (see throttle.py)
+        self.pickup_throttle = pickup_throttle
+
+        # Optional background door opener (see doors.py). None means Locker.open() is called inline.
+        self.door_queue = door_queue
+
+        # Optional write-ahead log (see journal.py). None means state is in memory only.
+        # On startup the latest snapshot + journal tail is loaded back in.
+        self._journal = journal
+        if journal is not None:
+            self._restore_tokens(*journal.load(self.lockers))
+
+        # Optional operation metrics (see metrics.py). They wrap this instance's public operations,
+        # so with metrics=None nothing extra runs on any call.
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
+
 
     # Staff-only operations
     def insert_package_into_locker(self, staff: Staff, package_size: Size) -> AccessToken:
         self._require_staff(staff)
+        token = self._place_package(package_size)
+        self._commit_journal()
+        self._maybe_checkpoint()
+        return token
 
-        for locker in self.lockers:
-            if locker.size == package_size and locker.is_empty():
-                token = self._generate_access_token(locker)
-                locker.mark_full()
-                self._tokens_by_code[token.get_code()] = token
-                return token
+    def insert_packages_bulk(self, staff: Staff, sizes: List[Size]) -> BulkInsertResult:
+        """
+        Truck unload: insert many packages in one call.
+        Staff is checked once, every token shares one expiration date, and a package that can't be placed
+        is reported in `failures` instead of stopping the rest of the unload.
+        """
+        self._require_staff(staff)
 
-        raise ValueError(f"No available locker of size {package_size.value}")
+        expires_at = self._new_expiry()
+        tokens: List[Optional[AccessToken]] = []
+        failures: List[BulkInsertFailure] = []
+
+        for index, package_size in enumerate(sizes):
+            try:
+                tokens.append(self._place_package(package_size, expires_at))
+            except ValueError as e:
+                tokens.append(None)
+                failures.append(BulkInsertFailure(index, package_size, str(e)))
+
+        self._commit_journal()
+        self._maybe_checkpoint()
+        return BulkInsertResult(tokens=tokens, failures=failures)
+
+    def free_count(self, size: Size) -> int:
+        """Return number of empty lockers of that size (O(1))."""
+        return len(self._free_lockers[size])
+
+    def occupied_count(self, size: Size) -> int:
+        """Lockers of that size not in the free pool, including ones whose door is still opening (O(1))."""
+        return self._locker_count[size] - len(self._free_lockers[size])
+
+    def token_count(self) -> int:
+        return len(self._tokens_by_code)
+
+    def expiring_count(self, hours: int, now: Optional[float] = None) -> int:
+        """
+        How many live tokens are expired or expire within the next `hours`, to the clock hour
+        (a token due later in the last hour is counted too). Cost is one pass over the hour buckets
+        (about 24 * token_valid_days of them), whatever the number of tokens.
+        """
+        if now is None:
+            now = self._clock()
+        limit_hour = int(now + hours * 3600) // 3600
+        with self._expiry_lock:
+            return sum(count for hour, count in self._expiry_hour_counts.items() if hour <= limit_hour)
 
     def open_expired_packages(self, staff: Staff) -> List[Locker]:
         """
         Finds all expired tokens, opens their lockers, clears tokens and marks those lockers empty (since staff is removing the packages).
-        Returns the list of lockers that were opened.
+        Returns the list of lockers that were opened (a locker whose door failed is in failed_doors() instead).
+        With a door_queue the doors open concurrently; this still returns once they are all done.
         """
-        self._require_staff(staff)
+        doors = self.open_expired_packages_async(staff)
+        wait([door for _, door in doors])
+        return [locker for locker, door in doors if door.exception() is None]
 
-        expired_codes = [code for code, tok in self._tokens_by_code.items() if tok.is_expired()]
-        opened_lockers: List[Locker] = []
+    def open_expired_packages_async(self, staff: Staff) -> List[Tuple[Locker, Future]]:
+        """
+        Same sweep, but returns as soon as the tokens are cleared: one (locker, door future) pair per expired package.
+        Each future resolves to the locker when its door has opened (or holds the driver error).
+        A failed door never stops the sweep: the due tokens are already off the expiry heap, so any left
+        unprocessed would never be swept again.
+        """
+        self._require_staff(staff)
 
-        for code in expired_codes:
-            tok = self._tokens_by_code.pop(code)
+        # One clock reading for the whole sweep; cost is O(k log n) for k expired tokens.
+        now = self._clock()
+        due: List[AccessToken] = []
+        with self._expiry_lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                due.append(heapq.heappop(heap)[2])
+
+        # Skips tokens already picked up (the code may even be reused by a newer token)
+        claimed = [tok for tok in due if self._claim_token(tok)]
+        # Expiries are durable before any door opens
+        self._commit_journal()
+
+        doors: List[Tuple[Locker, Future]] = []
+        for tok in claimed:
             locker = tok.get_compartment()
-            locker.open()
-            locker.mark_empty()
-            opened_lockers.append(locker)
+            try:
+                door = self._open_door(locker)
+            except Exception as e:
+                # Inline door failed (already in failed_doors): hand the error back like a door_queue would
+                door = Future()
+                door.set_exception(e)
+            doors.append((locker, door))
+
+        self._maybe_checkpoint()
+        return doors
+
+    def expiring_within(self, seconds: int, now: Optional[float] = None) -> List[AccessToken]:
+        """
+        Report: live tokens that are expired or will expire in the next `seconds` (e.g. 24 * 3600 for "today").
+        One clock reading. Walks only the top of the expiry heap (a child is never due before its parent),
+        so the cost is O(k) for k due tokens (+ stale entries among them), not a pass over every token.
+        """
+        if now is None:
+            now = self._clock()
+        limit = now + seconds
+
+        due: List[AccessToken] = []
+        with self._expiry_lock:
+            heap = self._expiry_heap
+            stack = [0] if heap else []
+            while stack:
+                i = stack.pop()
+                expires_at, _, tok = heap[i]
+                if expires_at > limit:
+                    continue
+                if self._tokens_by_code.get(tok.get_code()) is tok:
+                    due.append(tok)
+                stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(heap))
+        return due
+
+    def failed_doors(self) -> List[Locker]:
+        """Lockers stuck after a door failed to open (occupied, no token, not handed out)."""
+        with self._failed_lock:
+            return list(self._failed_doors.values())
+
+    def retry_door(self, staff: Staff, locker_id: str) -> Future:
+        """
+        Try a failed door again. The future resolves to the locker once it opens, and the locker goes back to its pool;
+        if it fails again it stays in failed_doors(). Without a door_queue the open runs inline (and raises on failure).
+        """
+        self._require_staff(staff)
+        return self._open_door(self._failed_locker(locker_id))
+
+    def release_failed_locker(self, staff: Staff, locker_id: str) -> Locker:
+        """Staff emptied a failed locker by hand (e.g. opened it with a key): put it back in its free pool."""
+        self._require_staff(staff)
+        locker = self._failed_locker(locker_id)
+        self._door_opened(locker)
+        return locker
 
-        return opened_lockers
+    def checkpoint(self) -> None:
+        """
+        Write a snapshot of every live token to the journal and start a fresh journal segment.
+        Briefly stops all inserts and pickups (takes every size and token lock) so the snapshot is consistent.
+        """
+        if self._journal is None:
+            raise ValueError("LockerSystem has no journal to checkpoint")
+
+        with ExitStack() as stack:
+            for lock in self._size_locks.values():
+                stack.enter_context(lock)
+            for lock in self._token_locks:
+                stack.enter_context(lock)
+            stack.enter_context(self._failed_lock)
+            self._journal.write_snapshot(list(self._tokens_by_code.values()), list(self._failed_doors))
 
  
     # Customer operation
-    def pick_up_package(self, token_code: str) -> str:
+    def pick_up_package(self, token_code: str, kiosk_id: str = "default") -> str:
         """
         Customer provides token_code.
+        kiosk/bank over its wrong-code budget (pickup_throttle) -> "throttled", token table not touched
         check invalid token -> "invalid_token"
         check expired token -> "token_expired"
         (success)-> opens locker, marks empty, removes token -> "picked_up"
+        With a door_queue the token is cleared right away and the door opens in the background.
         """
-        tok = self._tokens_by_code.get(token_code)
-        if tok is None:
-            return "invalid_token"
-        if tok.is_expired():
-            return "token_expired"
-
-        locker = tok.get_compartment()
-        locker.open()
-        locker.mark_empty()
-        self._tokens_by_code.pop(token_code, None)
+        throttle = self.pickup_throttle
+        if throttle is not None and throttle.blocked(kiosk_id):
+            return "throttled"
+
+        with self._token_lock(token_code):
+            tok = self._tokens_by_code.get(token_code)
+            if tok is None:
+                if throttle is not None:
+                    throttle.record_failure(kiosk_id)
+                return "invalid_token"
+            if tok.is_expired(self._clock()):
+                return "token_expired"
+            self._remove_token_locked(tok, expired=False)
+
+        self._compact_expiry_heap()
+        # The pickup is durable before the door opens
+        self._commit_journal()
+
+        self._open_door(tok.get_compartment())
+        self._maybe_checkpoint()
         return "picked_up"
 
     
-    def _generate_access_token(self, compartment: Locker) -> AccessToken:
-        # 6-digit token, avoid collisions
-        while True:
-            code = f"{random.randint(0, 999999):06d}" #genrates a random int, pad 0s in empty spaces, 6 ensures 6 digits, d is integer
-            if code not in self._tokens_by_code:
-                break
+    def _place_package(self, package_size: Size, expires_at: Optional[int] = None) -> AccessToken:
+        for size in self._sizes_to_try[package_size]:
+            with self._size_locks[size]:
+                free_list = self._free_lockers[size]
+                if not free_list:
+                    continue
+
+                # Generate first: if no code is available the locker stays in the pool
+                token = self._generate_access_token(free_list[-1], expires_at)
+                locker = free_list.pop()
+                locker.mark_full()
+                if size != package_size:
+                    self.upgrade_counts[(package_size, size)] += 1
+
+                # Still under the size lock, so a checkpoint never sees the locker taken but the token missing
+                if self._journal is not None:
+                    self._journal.record_insert(token)
+                self._add_token(token)
+                return token
 
-        expiration_date = datetime.now() + timedelta(days=token_valid_days)
-        return AccessToken(code=code, expiration_date=expiration_date, compartment=compartment)
+        raise ValueError(f"No available locker of size {package_size.value}")
+
+    def _generate_access_token(self, compartment: Locker, expires_at: Optional[int] = None) -> AccessToken:
+        # Allocator guarantees the code is not held by any live token, no retry loop needed
+        with self._code_lock:
+            code = self._code_allocator.allocate()
+
+        if expires_at is None:
+            expires_at = self._new_expiry()
+        return AccessToken(code=code, expires_at=expires_at, compartment=compartment)
+
+    def _new_expiry(self) -> int:
+        return int(self._clock()) + token_valid_days * 24 * 60 * 60
+
+    def _token_lock(self, code: str) -> ContextManager:
+        return self._token_locks[hash(code) % len(self._token_locks)]
+
+    def _add_token(self, token: AccessToken) -> None:
+        with self._token_lock(token.get_code()):
+            self._tokens_by_code[token.get_code()] = token
+        with self._expiry_lock:
+            heapq.heappush(self._expiry_heap, (token.expires_at, next(self._expiry_seq), token))
+            hour = token.expires_at // 3600
+            self._expiry_hour_counts[hour] = self._expiry_hour_counts.get(hour, 0) + 1
+
+    def _claim_token(self, token: AccessToken) -> bool:
+        """Remove token if it is still the live one for its code. Whoever claims it owns its locker."""
+        with self._token_lock(token.get_code()):
+            if self._tokens_by_code.get(token.get_code()) is not token:
+                return False
+            self._remove_token_locked(token, expired=True)
+            return True
+
+    def _remove_token_locked(self, token: AccessToken, expired: bool) -> None:
+        """Caller must hold the token's lock. Any heap entry is left behind and skipped lazily."""
+        del self._tokens_by_code[token.get_code()]
+        with self._expiry_lock:
+            hour = token.expires_at // 3600
+            left = self._expiry_hour_counts[hour] - 1
+            if left:
+                self._expiry_hour_counts[hour] = left
+            else:
+                del self._expiry_hour_counts[hour]
+        # Journal before the code is released, so a reuse of the code is always logged after this removal
+        if self._journal is not None:
+            self._journal.record_remove(token.get_code(), expired)
+        with self._code_lock:
+            self._code_allocator.release(token.get_code())
+
+    def _compact_expiry_heap(self) -> None:
+        # Keep the heap bounded: once it holds more than twice the live tokens (so stale entries outnumber live ones),
+        # rebuild it from the live ones (O(n), amortized O(1) per pickup).
+        with self._expiry_lock:
+            if len(self._expiry_heap) <= 2 * len(self._tokens_by_code):
+                return
+            live = self._tokens_by_code
+            self._expiry_heap = [entry for entry in self._expiry_heap if live.get(entry[2].get_code()) is entry[2]]
+            heapq.heapify(self._expiry_heap)
+
+    def _open_door(self, locker: Locker) -> Future:
+        """
+        Open the door of a locker whose token was just cleared. The locker goes back to its free pool only once
+        the door has actually opened, so it is never handed out while the old package may still be inside
+        (a failed door leaves it occupied and in failed_doors() for staff to retry or release).
+        """
+        if self.door_queue is None:
+            try:
+                locker.open()
+            except Exception:
+                self._door_failed(locker)
+                raise
+            self._door_opened(locker)
+            done: Future = Future()
+            done.set_result(locker)
+            return done
+
+        door = self.door_queue.submit(locker)
+        door.add_done_callback(lambda f: self._door_opened(locker) if f.exception() is None else self._door_failed(locker))
+        return door
+
+    def _door_failed(self, locker: Locker) -> None:
+        with self._failed_lock:
+            if locker.id in self._failed_doors:
+                return
+            self._failed_doors[locker.id] = locker
+            # Under the failed-door lock, so a checkpoint sees the failure either in its snapshot or after it
+            if self._journal is not None:
+                self._journal.record_door_failed(locker.id)
+        self._commit_journal()
+
+    def _door_opened(self, locker: Locker) -> None:
+        with self._failed_lock:
+            if self._failed_doors.pop(locker.id, None) is not None and self._journal is not None:
+                self._journal.record_door_cleared(locker.id)
+        self._commit_journal()
+        self._release(locker)
+
+    def _failed_locker(self, locker_id: str) -> Locker:
+        with self._failed_lock:
+            locker = self._failed_doors.get(locker_id)
+        if locker is None:
+            raise ValueError(f"Locker {locker_id} has no failed door")
+        return locker
+
+    def _commit_journal(self) -> None:
+        """Wait until this thread's journal records are on disk (call with no system locks held)."""
+        if self._journal is not None:
+            self._journal.commit()
+
+    def _maybe_checkpoint(self) -> None:
+        if self._journal is not None and self._journal.checkpoint_due():
+            self.checkpoint()
+
+    def _restore_tokens(self, tokens: List[AccessToken], failed_doors: List[Locker]) -> None:
+        """
+        Load tokens recovered from a snapshot/journal into a fresh system (nothing journaled).
+        O(n): marks their lockers (and failed-door lockers) full, rebuilds the free pools and expiry heap,
+        and reserves their codes.
+        """
+        for locker in failed_doors:
+            locker.mark_full()
+            self._failed_doors[locker.id] = locker
+        for token in tokens:
+            token.get_compartment().mark_full()
+            self._tokens_by_code[token.get_code()] = token
+            self._code_allocator.reserve(token.get_code())
+
+        self._expiry_heap = [(token.expires_at, next(self._expiry_seq), token) for token in tokens]
+        heapq.heapify(self._expiry_heap)
+        self._expiry_hour_counts = {}
+        for token in tokens:
+            hour = token.expires_at // 3600
+            self._expiry_hour_counts[hour] = self._expiry_hour_counts.get(hour, 0) + 1
+
+        self._free_lockers = {size: [] for size in Size}
+        for locker in self.lockers:
+            if locker.is_empty():
+                self._free_lockers[locker.size].append(locker)
+
+    def _release(self, locker: Locker) -> None:
+        # Mark empty and hand the locker back to its size pool (guarded so it never lands in the pool twice)
+        with self._size_locks[locker.size]:
+            if locker.is_empty():
+                return
+            locker.mark_empty()
+            self._free_lockers[locker.size].append(locker)
 
     def _require_staff(self, staff: Staff) -> None:
         if staff is None or not staff.is_valid():
             raise AuthorizationError("Unauthorized: only valid staff can perform this action.")
+        if self.staff_registry is not None and not self.staff_registry.is_authorized(staff):
+            raise AuthorizationError("Unauthorized: only valid staff can perform this action.")
 
 """
 # Example usage
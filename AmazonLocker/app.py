@@ -1,4 +1,13 @@
-from AmazonLocker import Locker, LockerSystem, Size, Staff, AuthorizationError
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from AmazonLocker import AccessToken, Locker, LockerSystem, Size, Staff, AuthorizationError
+from journal import LockerJournal
+from throttle import PickupThrottle
+
+# Listing rows per page in the CLI
+PAGE_SIZE = 20
+
 
 def print_header():
     print("\n" + "=" * 55)
@@ -6,24 +15,68 @@ def print_header():
     print("=" * 55)
 
 
+def print_dashboard(system: LockerSystem):
+    # Live counters only, O(1) however many lockers/tokens the site has
+    print("\nOccupancy:")
+    for size in Size:
+        print(f" - {size.value:<6} | free {system.free_count(size):>6} | occupied {system.occupied_count(size):>6}")
+    print(f"Active tokens: {system.token_count()}")
+    print(f"Expired or expiring within 24h: {system.expiring_count(24)}")
+
+
+def iter_lockers(system: LockerSystem, size: Optional[Size] = None, status: Optional[str] = None) -> Iterator[str]:
+    for l in system.lockers:
+        if size is not None and l.size != size:
+            continue
+        current = "EMPTY" if l.is_empty() else "OCCUPIED"
+        if status is not None and current != status:
+            continue
+        yield f" - {l.id:>2} | {l.size.value:<6} | {current}"
+
+
+def iter_tokens(system: LockerSystem, within_hours: Optional[int] = None) -> Iterator[str]:
+    if within_hours is None:
+        # accessing protected member only for demo UI
+        tokens: Iterable[AccessToken] = system._tokens_by_code.values()
+    else:
+        tokens = system.expiring_within(within_hours * 3600)
+    for t in tokens:
+        exp = t.expiration_date.strftime("%Y-%m-%d %H:%M")
+        yield f" - {t.code} | Locker={t.compartment.id} | Expires={exp}"
+
+
+def print_paged(lines: Iterator[str]):
+    # Formats only the page being shown; stops as soon as the user has seen enough
+    shown = 0
+    while True:
+        page = list(islice(lines, PAGE_SIZE))
+        if not page:
+            if not shown:
+                print(" (none)")
+            return
+        for line in page:
+            print(line)
+        shown += len(page)
+        if len(page) < PAGE_SIZE or input(f"-- {shown} shown, Enter for more, q to stop: ").strip().lower() == "q":
+            return
+
+
 def print_lockers(system: LockerSystem):
+    print_dashboard(system)
+    s = input("\nList lockers of size (S/M/L, blank = all): ").strip().upper()
+    size = {"S": Size.SMALL, "M": Size.MEDIUM, "L": Size.LARGE}.get(s)
+    st = input("Only status (E = empty, O = occupied, blank = all): ").strip().upper()
+    status = {"E": "EMPTY", "O": "OCCUPIED"}.get(st)
     print("\nLockers:")
-    for l in system.lockers:
-        status = "EMPTY" if l.is_empty() else "OCCUPIED"
-        print(f" - {l.id:>2} | {l.size.value:<6} | {status}")
+    print_paged(iter_lockers(system, size, status))
 
 
 def print_tokens(system: LockerSystem):
-    # accessing protected member only for demo UI
-    tokens = list(system._tokens_by_code.values())
+    print(f"\nActive tokens: {system.token_count()}")
+    h = input("Only expiring within N hours (blank = all): ").strip()
+    within_hours = int(h) if h.isdigit() else None
     print("\nActive Tokens:")
-    if not tokens:
-        print(" (none)")
-        return
-
-    for t in tokens:
-        exp = t.expiration_date.strftime("%Y-%m-%d %H:%M")
-        print(f" - {t.code} | Locker={t.compartment.id} | Expires={exp}")
+    print_paged(iter_tokens(system, within_hours))
 
 
 def choose_size() -> Size:
@@ -38,6 +91,15 @@ def choose_size() -> Size:
         print("Invalid choice. Please enter S, M, or L.")
 
 
+def choose_sizes() -> list[Size]:
+    by_letter = {"S": Size.SMALL, "M": Size.MEDIUM, "L": Size.LARGE}
+    while True:
+        s = input("Enter sizes, one letter per package (e.g. SSMLL): ").strip().upper()
+        if s and all(c in by_letter for c in s):
+            return [by_letter[c] for c in s]
+        print("Invalid input. Use only S, M, or L.")
+
+
 def staff_login() -> Staff:
     staff_id = input("Enter staff id: ").strip()
     active_str = input("Is staff active? (y/n): ").strip().lower()
@@ -52,15 +114,19 @@ def main():
         Locker("B1", Size.MEDIUM),
         Locker("C1", Size.LARGE),
     ]
-    system = LockerSystem(lockers)
+    # Tokens survive restarts: state is journaled to ./locker_state (each operation on disk before it returns)
+    journal = LockerJournal("locker_state")
+    # Full size -> next larger size with room, instead of turning the courier away
+    system = LockerSystem(lockers, journal=journal, allow_upgrade=True, pickup_throttle=PickupThrottle())
 
     while True:
         print_header()
-        print("1) View lockers")
+        print("1) View occupancy and lockers")
         print("2) View active tokens (demo)")
         print("3) Staff: Insert package")
         print("4) Staff: Open expired packages")
         print("5) Customer: Pick up package")
+        print("6) Staff: Bulk insert packages (truck unload)")
         print("0) Exit")
 
         choice = input("\nChoose an option: ").strip()
@@ -105,10 +171,27 @@ def main():
                 print("\n✅ Pick up successful.")
             elif result == "token_expired":
                 print("\n❌ Token expired. Please contact staff.")
+            elif result == "throttled":
+                print("\n❌ Too many wrong codes. Please wait and try again.")
             else:
                 print("\n❌ Invalid token.")
 
+        elif choice == "6":
+            staff = staff_login()
+            sizes = choose_sizes()
+            try:
+                result = system.insert_packages_bulk(staff, sizes)
+                stored = [t for t in result.tokens if t is not None]
+                print(f"\n✅ Stored {len(stored)} of {len(sizes)} packages.")
+                for t in stored:
+                    print(f" - {t.code} | Locker={t.compartment.id}")
+                for f in result.failures:
+                    print(f"❌ Package #{f.index + 1} ({f.size.value}): {f.reason}")
+            except AuthorizationError as e:
+                print(f"\n❌ {e}")
+
         elif choice == "0":
+            journal.close()
             print("\nGoodbye!")
             break
 
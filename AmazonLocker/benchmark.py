@@ -0,0 +1,482 @@
+"""
+Small benchmarks for the locker backend.
+
+Run:
+    python benchmark.py
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import List, Set
+
+import AmazonLocker
+import compact as compact_module
+from AmazonLocker import KeyedPermutationCodeAllocator, Locker, LockerSystem, Size, Staff
+from compact import CompactLockerSystem
+from doors import DoorQueue, FakeActuatorDriver
+from federation import LockerFederation
+from staff_registry import FakeStaffDirectory, StaffRegistry
+from throttle import PickupThrottle
+from journal import LockerJournal
+from metrics import LockerMetrics
+
+
+STAFF = Staff(id="S-BENCH", active=True)
+
+
+def build_lockers(n: int, size: Size = Size.SMALL) -> List[Locker]:
+    return [Locker(f"L{i}", size) for i in range(n)]
+
+
+def bench_insert_at_high_occupancy(n: int = 100_000, probe: int = 1_000) -> None:
+    """
+    Fill the bank to 90% / 95% / 99%, then time `probe` inserts at that level.
+    With per-size free pools the per-insert latency should stay flat as the bank fills up.
+    """
+    print(f"\ninsert latency, {n} lockers")
+    system = LockerSystem(build_lockers(n))
+
+    for target in (0.90, 0.95, 0.99):
+        while n - system.free_count(Size.SMALL) < int(n * target):
+            system.insert_package_into_locker(STAFF, Size.SMALL)
+
+        start = time.perf_counter()
+        for _ in range(probe):
+            system.insert_package_into_locker(STAFF, Size.SMALL)
+        elapsed = time.perf_counter() - start
+
+        occupancy = 1 - system.free_count(Size.SMALL) / n
+        print(f" - {target:.0%} full -> {elapsed / probe * 1e6:8.2f} us/insert (now {occupancy:.1%})")
+
+
+def bench_expiry_sweep(live: int = 200_000, expired: int = 200, sweeps: int = 20) -> None:
+    """
+    Staff sweep over many live tokens where only a handful have expired.
+    The expiry heap means a sweep only touches the expired ones.
+    """
+    print(f"\nexpiry sweep, {live} live tokens, {expired} expired")
+    system = LockerSystem(build_lockers(live + expired * sweeps))
+
+    for _ in range(live):
+        system.insert_package_into_locker(STAFF, Size.SMALL)
+
+    total = 0.0
+    for _ in range(sweeps):
+        # Insert already-expired packages, then sweep them (door prints are silenced)
+        AmazonLocker.token_valid_days = -1
+        try:
+            for _ in range(expired):
+                system.insert_package_into_locker(STAFF, Size.SMALL)
+        finally:
+            AmazonLocker.token_valid_days = 7
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            opened = system.open_expired_packages(STAFF)
+            total += time.perf_counter() - start
+        assert len(opened) == expired
+
+    print(f" - {total / sweeps * 1e3:8.3f} ms/sweep")
+
+
+def _rejection_allocate(live: Set[str]) -> str:
+    # The old _generate_access_token loop, kept here only as a baseline
+    while True:
+        code = f"{random.randint(0, 999999):06d}"
+        if code not in live:
+            return code
+
+
+def bench_code_allocation(probe: int = 2_000) -> None:
+    """
+    Allocation latency with the 6-digit code space 50% / 90% / 99% full.
+    Each probe releases a random live code and allocates a new one, so occupancy stays put.
+    """
+    space = 10 ** 6
+    print(f"\ncode allocation, {space} code space")
+
+    for target in (0.50, 0.90, 0.99):
+        live_count = int(space * target)
+
+        allocator = KeyedPermutationCodeAllocator(code_length=6)
+        live = [allocator.allocate() for _ in range(live_count)]
+        start = time.perf_counter()
+        for _ in range(probe):
+            i = random.randrange(len(live))
+            allocator.release(live[i])
+            live[i] = allocator.allocate()
+        keyed = time.perf_counter() - start
+
+        live_set = set(random.sample(range(space), live_count))
+        live_set = {f"{c:06d}" for c in live_set}
+        start = time.perf_counter()
+        for _ in range(probe):
+            live_set.add(_rejection_allocate(live_set))
+            live_set.pop()
+        rejection = time.perf_counter() - start
+
+        print(f" - {target:.0%} full -> keyed {keyed / probe * 1e6:8.2f} us | rejection loop {rejection / probe * 1e6:8.2f} us")
+
+
+def bench_bulk_insert(n: int = 100_000, batch: int = 500) -> None:
+    """Truck unload of `batch` packages: one call per package vs one insert_packages_bulk call."""
+    print(f"\nbulk insert, batches of {batch}")
+    sizes = [Size.SMALL] * batch
+
+    system = LockerSystem(build_lockers(n))
+    start = time.perf_counter()
+    rounds = 0
+    while system.free_count(Size.SMALL) >= batch:
+        for size in sizes:
+            system.insert_package_into_locker(STAFF, size)
+        rounds += 1
+    single = (time.perf_counter() - start) / rounds
+
+    system = LockerSystem(build_lockers(n))
+    start = time.perf_counter()
+    rounds = 0
+    while system.free_count(Size.SMALL) >= batch:
+        system.insert_packages_bulk(STAFF, sizes)
+        rounds += 1
+    bulk = (time.perf_counter() - start) / rounds
+
+    print(f" - one by one {single * 1e3:8.2f} ms/batch | bulk {bulk * 1e3:8.2f} ms/batch")
+
+
+def bench_concurrent_stress(per_size: int = 20_000, ops_per_thread: int = 20_000) -> None:
+    """
+    Kiosk threads doing insert + pickup cycles on a thread_safe system, each thread on its own size
+    (so the per-size pools don't contend). Reports throughput as threads scale and checks no locker was handed out twice.
+    Note: under the GIL pure-Python work doesn't run in parallel; the number to watch is that throughput holds
+    instead of collapsing under lock contention.
+    """
+    print("\nconcurrent stress (insert + pickup cycles)")
+    sizes = list(Size)
+
+    for threads in (1, 2, 4, 8):
+        lockers = [Locker(f"{size.value[0]}{i}", size) for size in sizes for i in range(per_size)]
+        system = LockerSystem(lockers, thread_safe=True)
+        errors: List[str] = []
+
+        def kiosk(size: Size) -> None:
+            held = []
+            for i in range(ops_per_thread):
+                if held and (i % 2 or system.free_count(size) == 0):
+                    if system.pick_up_package(held.pop().get_code()) != "picked_up":
+                        errors.append("pickup failed")
+                else:
+                    held.append(system.insert_package_into_locker(STAFF, size))
+
+        workers = [threading.Thread(target=kiosk, args=(sizes[t % len(sizes)],)) for t in range(threads)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            elapsed = time.perf_counter() - start
+
+        occupied = sum(1 for l in lockers if not l.is_empty())
+        assert not errors, errors[:3]
+        assert occupied == len(system._tokens_by_code)
+        assert occupied + sum(system.free_count(size) for size in sizes) == len(lockers)
+
+        print(f" - {threads:2d} threads -> {threads * ops_per_thread / elapsed:10,.0f} ops/s")
+
+
+def _run_insert_pickup_ops(system: LockerSystem, ops: int, n: int) -> None:
+    # Fill to ~90%, then alternate pickup / insert; pickups pick a random live package
+    held = list(system._tokens_by_code)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(ops):
+            if len(held) < n * 0.9 or i % 2:
+                held.append(system.insert_package_into_locker(STAFF, Size.SMALL).get_code())
+            else:
+                j = random.randrange(len(held))
+                held[j], held[-1] = held[-1], held[j]
+                system.pick_up_package(held.pop())
+
+
+def bench_journal_recovery(ops: int = 1_000_000, n: int = 100_000) -> None:
+    """
+    Journal overhead per operation (group commit, fsync on), and recovery time after `ops` logged operations:
+    replaying the whole journal vs loading a snapshot taken near the end + replaying a short tail.
+    """
+    print(f"\njournal, {ops} logged ops, {n} lockers")
+
+    start = time.perf_counter()
+    _run_insert_pickup_ops(LockerSystem(build_lockers(n)), ops, n)
+    plain = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Single-threaded, durable=True would be one fsync per op: measure the batched path
+        journal = LockerJournal(directory, checkpoint_every=ops * 2, durable=False)
+        system = LockerSystem(build_lockers(n), journal=journal)
+        start = time.perf_counter()
+        _run_insert_pickup_ops(system, ops, n)
+        journal.flush()
+        logged = time.perf_counter() - start
+        journal.close()
+        size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+        print(f" - op cost: in-memory {plain / ops * 1e6:6.2f} us | journaled {logged / ops * 1e6:6.2f} us ({size_mb:.0f} MB log)")
+
+        start = time.perf_counter()
+        recovered = LockerSystem(build_lockers(n), journal=LockerJournal(directory, durable=False))
+        replay = time.perf_counter() - start
+        assert sorted(recovered._tokens_by_code) == sorted(system._tokens_by_code)
+        print(f" - recovery, full journal replay:    {replay:6.2f} s ({len(recovered._tokens_by_code)} live tokens)")
+
+        recovered.checkpoint()
+        _run_insert_pickup_ops(recovered, ops // 100, n)
+        recovered._journal.close()
+
+        start = time.perf_counter()
+        LockerSystem(build_lockers(n), journal=LockerJournal(directory))
+        print(f" - recovery, snapshot + {ops // 100} op tail: {time.perf_counter() - start:6.2f} s")
+
+
+def bench_compact_vs_dataclass(n: int = 200_000, probe: int = 20_000) -> None:
+    """
+    Memory (tracemalloc, bank 90% full) and insert / pickup speed: dataclass LockerSystem vs CompactLockerSystem.
+    Memory scales linearly, so the per-locker figure times 10^6 gives the million-locker footprint.
+    """
+    print(f"\ncompact backend vs dataclass, {n} lockers at 90% occupancy")
+    filled = int(n * 0.9)
+
+    builders = {
+        "dataclass": lambda: LockerSystem(build_lockers(n)),
+        "compact": lambda: CompactLockerSystem([Size.SMALL] * n),
+    }
+    for name, build in builders.items():
+        tracemalloc.start()
+        system = build()
+        for _ in range(filled):
+            system.insert_package_into_locker(STAFF, Size.SMALL)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        system = build()
+        codes = [system.insert_package_into_locker(STAFF, Size.SMALL).get_code() for _ in range(filled - probe)]
+        start = time.perf_counter()
+        for _ in range(probe):
+            codes.append(system.insert_package_into_locker(STAFF, Size.SMALL).get_code())
+        insert = (time.perf_counter() - start) / probe
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for code in codes[-probe:]:
+                system.pick_up_package(code)
+            pickup = (time.perf_counter() - start) / probe
+
+        print(f" - {name:<9} {memory / n:7.1f} B/locker ({memory / 1e6:6.1f} MB) | insert {insert * 1e6:6.2f} us | pickup {pickup * 1e6:6.2f} us")
+
+
+def bench_expiring_soon_report(live: int = 200_000, runs: int = 10) -> None:
+    """
+    "Expiring in the next hour" report, one clock reading per report. Inserts are spread over a simulated week,
+    so only a small share of tokens is due. Compares a per-token is_expired() loop with
+    LockerSystem.expiring_within (expiry-heap walk) and CompactLockerSystem.expiring_within (NumPy over columns).
+    """
+    print(f"\nexpiring-soon report, {live} live tokens (numpy: {'yes' if compact_module.np is not None else 'no'})")
+    day = 24 * 60 * 60
+    hour = 60 * 60
+    clock = [time.time()]
+
+    system = LockerSystem(build_lockers(live), clock=lambda: clock[0])
+    compact = CompactLockerSystem([Size.SMALL] * live, clock=lambda: clock[0])
+    for _ in range(live):
+        system.insert_package_into_locker(STAFF, Size.SMALL)
+        compact.insert_package_into_locker(STAFF, Size.SMALL)
+        clock[0] += 7 * day / live
+    later = clock[0]
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        [t for t in system._tokens_by_code.values() if t.is_expired(later + hour)]
+    loop = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        due = system.expiring_within(hour, now=later)
+    batch = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        compact.expiring_within(hour, now=later)
+    columns = (time.perf_counter() - start) / runs
+
+    print(f" - {len(due)} due | per-token loop {loop * 1e3:7.2f} ms | heap walk {batch * 1e3:7.2f} ms | compact columns {columns * 1e3:7.2f} ms")
+
+
+def bench_door_queue(expired: int = 200, latency_s: float = 0.1) -> None:
+    """Sweep of `expired` lockers with a fake actuator taking `latency_s` per door, by max doors in flight."""
+    print(f"\ndoor queue, sweep of {expired} expired lockers at {latency_s * 1e3:.0f} ms per door")
+
+    for max_parallel in (1, 8, 32):
+        queue = DoorQueue(FakeActuatorDriver(latency_s), max_parallel=max_parallel)
+        system = LockerSystem(build_lockers(expired), thread_safe=True, door_queue=queue)
+        AmazonLocker.token_valid_days = -1
+        try:
+            for _ in range(expired):
+                system.insert_package_into_locker(STAFF, Size.SMALL)
+        finally:
+            AmazonLocker.token_valid_days = 7
+
+        start = time.perf_counter()
+        doors = system.open_expired_packages_async(STAFF)
+        committed = time.perf_counter() - start
+        for _, door in doors:
+            door.result()
+        done = time.perf_counter() - start
+        queue.close()
+
+        print(f" - {max_parallel:2d} in flight -> state committed {committed * 1e3:6.1f} ms | all doors open {done:6.2f} s")
+
+
+def bench_federation(shards: int = 4, per_shard: int = 20_000, ops: int = 20_000) -> None:
+    """Insert (balanced across a site and its neighbors) + routed pickup through a federation: in-process vs process shards."""
+    print(f"\nfederation, {shards} shards x {per_shard} lockers")
+    neighbors = {s: [(s + 1) % shards, (s - 1) % shards] for s in range(shards)}
+
+    for processes in (False, True):
+        banks = [[Locker(f"{s}-{i}", Size.SMALL) for i in range(per_shard)] for s in range(shards)]
+        codes = []
+        # Silence door prints at the fd level so shard processes inherit it too
+        sys.stdout.flush()
+        saved_stdout = os.dup(1)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                federation = LockerFederation.build(banks, neighbors, processes=processes)
+                start = time.perf_counter()
+                for i in range(ops):
+                    if i % 2:
+                        federation.pick_up_package(codes.pop())
+                    else:
+                        codes.append(federation.insert_package_into_locker(STAFF, Size.SMALL, i % shards).get_code())
+                elapsed = time.perf_counter() - start
+                federation.close()
+        finally:
+            os.dup2(saved_stdout, 1)
+            os.close(saved_stdout)
+            os.close(devnull)
+
+        print(f" - {'process' if processes else 'in-process':<10} shards -> {ops / elapsed:10,.0f} ops/s")
+
+
+def bench_staff_registry(ops: int = 200, latency_s: float = 0.005) -> None:
+    """Staff operations (small bulk inserts + sweeps) against a directory taking `latency_s` per lookup."""
+    print(f"\nstaff registry, {ops} staff operations, {latency_s * 1e3:.0f} ms directory lookups")
+
+    for label, ttl_s in (("no cache", 0.0), ("cached, 300 s TTL", 300.0)):
+        directory = FakeStaffDirectory([STAFF.id], latency_s=latency_s)
+        system = LockerSystem(build_lockers(ops * 5), staff_registry=StaffRegistry(directory, ttl_s=ttl_s))
+        start = time.perf_counter()
+        for i in range(ops):
+            if i % 2:
+                system.open_expired_packages(STAFF)
+            else:
+                system.insert_packages_bulk(STAFF, [Size.SMALL] * 5)
+        elapsed = time.perf_counter() - start
+        print(f" - {label:<18} {elapsed / ops * 1e3:7.2f} ms/op ({directory.lookups} directory lookups)")
+
+
+def bench_pickup_throttle(n: int = 50_000, attack: int = 200_000) -> None:
+    """
+    Overhead of the throttle on legitimate pickups, and cost per rejected guess during a brute-force run
+    (random 6-digit codes from 1000 kiosks; the throttle keeps at most 10,000 buckets).
+    """
+    print(f"\npickup throttle, {n} legitimate pickups, {attack} guesses")
+
+    for label, throttle in (("no throttle", None), ("throttle", PickupThrottle())):
+        system = LockerSystem(build_lockers(n), pickup_throttle=throttle)
+        codes = [system.insert_package_into_locker(STAFF, Size.SMALL).get_code() for _ in range(n)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for code in codes:
+                system.pick_up_package(code, kiosk_id="K1")
+            legit = (time.perf_counter() - start) / n
+
+        guesses = [f"{random.randrange(10 ** 6):06d}" for _ in range(attack)]
+        start = time.perf_counter()
+        outcomes = {}
+        for i, code in enumerate(guesses):
+            result = system.pick_up_package(code, kiosk_id=f"K{i % 1000}")
+            outcomes[result] = outcomes.get(result, 0) + 1
+        guess = (time.perf_counter() - start) / attack
+
+        print(f" - {label:<11} legit {legit * 1e6:6.2f} us/pickup | guess {guess * 1e6:6.2f} us | {outcomes}")
+
+
+def bench_metrics_overhead(n: int = 50_000) -> None:
+    """Insert + pickup cycle with and without LockerMetrics attached, then a snapshot of the instrumented run."""
+    print(f"\nmetrics overhead, {n} insert+pickup cycles")
+    snapshot = None
+    for label in ("off", "on"):
+        metrics = LockerMetrics() if label == "on" else None
+        system = LockerSystem(build_lockers(n), metrics=metrics)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for _ in range(n):
+                token = system.insert_package_into_locker(STAFF, Size.SMALL)
+                system.pick_up_package(token.get_code())
+                system.pick_up_package("000000")
+            elapsed = time.perf_counter() - start
+        print(f" - metrics {label:<3} {elapsed / n * 1e6:6.2f} us/cycle")
+        if metrics is not None:
+            start = time.perf_counter()
+            snapshot = metrics.snapshot()
+            print(f"   snapshot in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    for op, stats in snapshot["latency_us"].items():
+        print(f"   {op:<27} p50 {stats['p50']:6.2f} us  p99 {stats['p99']:6.2f} us  (n={stats['count']})")
+    print(f"   counters: {snapshot['counters']}")
+
+
+def bench_dashboard(n: int = 100_000, runs: int = 100) -> None:
+    """Live aggregate counters (what the CLI dashboard shows) vs recounting by scanning every locker/token."""
+    print(f"\ndashboard, {n} lockers")
+    system = LockerSystem(build_lockers(n))
+    for _ in range(n // 2):
+        system.insert_package_into_locker(STAFF, Size.SMALL)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        counts = [(system.free_count(size), system.occupied_count(size)) for size in Size]
+        due = system.expiring_count(24)
+    live = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    for _ in range(runs // 10):
+        occupied = sum(1 for l in system.lockers if not l.is_empty())
+        due_scan = sum(1 for t in system._tokens_by_code.values() if t.expires_at <= time.time() + 24 * 3600)
+    scan = (time.perf_counter() - start) / (runs // 10)
+
+    assert counts[0][1] == occupied and due == due_scan
+    print(f" - live counters {live * 1e6:8.2f} us | full scan {scan * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    bench_insert_at_high_occupancy()
+    bench_expiry_sweep()
+    bench_code_allocation()
+    bench_bulk_insert()
+    bench_concurrent_stress()
+    bench_journal_recovery()
+    bench_compact_vs_dataclass()
+    bench_expiring_soon_report()
+    bench_door_queue()
+    bench_federation()
+    bench_staff_registry()
+    bench_pickup_throttle()
+    bench_metrics_overhead()
+    bench_dashboard()
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import heapq
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence
+
+import AmazonLocker
+from AmazonLocker import (
+    AccessToken,
+    AuthorizationError,
+    BulkInsertFailure,
+    BulkInsertResult,
+    CodeAllocator,
+    KeyedPermutationCodeAllocator,
+    Locker,
+    Size,
+    Staff,
+)
+
+try:
+    import numpy as np
+except ImportError:  # optional: expiring_within falls back to a plain Python pass
+    np = None
+
+_SIZES: List[Size] = list(Size)
+_SIZE_INDEX: Dict[Size, int] = {size: i for i, size in enumerate(_SIZES)}
+
+_NO_TOKEN = -1
+_LOW_32 = 0xFFFFFFFF
+
+
+class CompactLockerSystem:
+    """
+    LockerSystem's core API (insert, bulk insert, pickup, expiry sweep, free/occupied/token counts, expiring_within),
+    but stores state as columns instead of one object per locker / token.
+    Meant for million-locker deployments where the dataclass version's memory is the problem.
+    Not supported: pickup throttling (no kiosk_id on pick_up_package), door queue / open_expired_packages_async,
+    expiring_count, size upgrades, staff registry and metrics.
+
+    Per locker (index i), all in flat arrays:
+    - size[i]           -> Size ordinal
+    - occupied[i]       -> 0/1
+    - token_code[i]     -> code as int (-1 when empty)
+    - token_expiry[i]   -> expiration as integer epoch seconds
+    - token_gen[i]      -> bumped on every insert, used to spot stale expiry-heap entries
+
+    Tokens are the (code, expiry, locker index) record in those columns plus one dict entry code -> index.
+    Free pools are int arrays per size (stack), and the expiry heap holds packed ints
+    (expiry << 64 | index << 32 | gen) instead of tuples.
+
+    Locker / AccessToken objects are only built when returned to the caller; they are read-only views,
+    changing them does not change the system. Single-threaded, no journal (use LockerSystem for those).
+    """
+
+    def __init__(
+        self,
+        sizes: Sequence[Size],
+        ids: Optional[Sequence[str]] = None,
+        code_allocator: Optional[CodeAllocator] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        if ids is not None and len(ids) != len(sizes):
+            raise ValueError("ids and sizes must have the same length")
+
+        n = len(sizes)
+        self._clock = clock
+        self._ids = list(ids) if ids is not None else None
+        self._size = array("b", (_SIZE_INDEX[size] for size in sizes))
+        self._locker_count = [0] * len(_SIZES)
+        for size in self._size:
+            self._locker_count[size] += 1
+        self._occupied = bytearray(n)
+        self._token_code = array("q", [_NO_TOKEN]) * n
+        self._token_expiry = array("q", [0]) * n
+        self._token_gen = array("L", [0]) * n
+
+        # code (int) -> locker index
+        self._locker_by_code: Dict[int, int] = {}
+        self._code_allocator: CodeAllocator = code_allocator or KeyedPermutationCodeAllocator()
+        self._code_length: Optional[int] = None
+
+        self._expiry_heap: List[int] = []
+
+        # Free pools per size, stack behavior like LockerSystem
+        self._free: List[array] = []
+        self._rebuild_free_pools()
+
+    @classmethod
+    def from_lockers(
+        cls,
+        lockers: List[Locker],
+        code_allocator: Optional[CodeAllocator] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> CompactLockerSystem:
+        """Build from the usual Locker list (lockers already marked occupied stay out of the free pools)."""
+        system = cls([locker.size for locker in lockers], [locker.id for locker in lockers], code_allocator, clock)
+        for i, locker in enumerate(lockers):
+            if not locker.is_empty():
+                system._occupied[i] = 1
+        system._rebuild_free_pools()
+        return system
+
+    @property
+    def lockers(self) -> List[Locker]:
+        """Read-only Locker views of every compartment (O(n), for listings)."""
+        return [self._locker_view(i) for i in range(len(self._size))]
+
+
+    # Staff-only operations
+    def insert_package_into_locker(self, staff: Staff, package_size: Size) -> AccessToken:
+        self._require_staff(staff)
+        return self._place_package(package_size, self._new_expiry())
+
+    def insert_packages_bulk(self, staff: Staff, sizes: List[Size]) -> BulkInsertResult:
+        self._require_staff(staff)
+
+        expiry = self._new_expiry()
+        tokens: List[Optional[AccessToken]] = []
+        failures: List[BulkInsertFailure] = []
+
+        for index, package_size in enumerate(sizes):
+            try:
+                tokens.append(self._place_package(package_size, expiry))
+            except ValueError as e:
+                tokens.append(None)
+                failures.append(BulkInsertFailure(index, package_size, str(e)))
+
+        return BulkInsertResult(tokens=tokens, failures=failures)
+
+    def free_count(self, size: Size) -> int:
+        """Return number of empty lockers of that size (O(1))."""
+        return len(self._free[_SIZE_INDEX[size]])
+
+    def occupied_count(self, size: Size) -> int:
+        index = _SIZE_INDEX[size]
+        return self._locker_count[index] - len(self._free[index])
+
+    def token_count(self) -> int:
+        return len(self._locker_by_code)
+
+    def expiring_within(self, seconds: int, now: Optional[float] = None) -> List[AccessToken]:
+        """
+        Live tokens expired or expiring in the next `seconds`.
+        With NumPy this is one vectorized comparison straight over the expiry / code columns (no copy).
+        """
+        if now is None:
+            now = self._clock()
+        limit = now + seconds
+
+        if np is not None:
+            expiry = np.frombuffer(self._token_expiry, dtype=np.int64)
+            live = np.frombuffer(self._token_code, dtype=np.int64) != _NO_TOKEN
+            indices = np.flatnonzero(live & (expiry <= limit)).tolist()
+        else:
+            indices = [i for i in self._locker_by_code.values() if self._token_expiry[i] <= limit]
+        return [self._token_view(i) for i in indices]
+
+    def open_expired_packages(self, staff: Staff) -> List[Locker]:
+        self._require_staff(staff)
+
+        now = self._clock()
+        heap = self._expiry_heap
+        opened_lockers: List[Locker] = []
+
+        while heap and heap[0] >> 64 <= now:
+            entry = heapq.heappop(heap)
+            i = (entry >> 32) & _LOW_32
+            if not self._is_live_entry(entry):
+                continue  # picked up already (locker may even hold a newer token)
+
+            self._clear_token(i)
+            locker = self._locker_view(i)
+            locker.open()
+            opened_lockers.append(locker)
+
+        return opened_lockers
+
+
+    # Customer operation
+    def pick_up_package(self, token_code: str) -> str:
+        if len(token_code) != self._code_length or not token_code.isdigit():
+            return "invalid_token"
+        i = self._locker_by_code.get(int(token_code))
+        if i is None:
+            return "invalid_token"
+        if self._clock() >= self._token_expiry[i]:
+            return "token_expired"
+
+        self._clear_token(i)
+        self._compact_expiry_heap()
+
+        locker = self._locker_view(i)
+        locker.open()
+        return "picked_up"
+
+
+    def _place_package(self, package_size: Size, expiry: int) -> AccessToken:
+        free_list = self._free[_SIZE_INDEX[package_size]]
+        if not free_list:
+            raise ValueError(f"No available locker of size {package_size.value}")
+
+        code = self._code_allocator.allocate()
+        self._code_length = len(code)
+        i = free_list.pop()
+
+        self._occupied[i] = 1
+        self._token_code[i] = int(code)
+        self._token_expiry[i] = expiry
+        gen = (self._token_gen[i] + 1) & _LOW_32
+        self._token_gen[i] = gen
+        self._locker_by_code[int(code)] = i
+        heapq.heappush(self._expiry_heap, (expiry << 64) | (i << 32) | gen)
+
+        return self._token_view(i)
+
+    def _clear_token(self, i: int) -> None:
+        code = self._token_code[i]
+        del self._locker_by_code[code]
+        self._code_allocator.release(f"{code:0{self._code_length}d}")
+        self._token_code[i] = _NO_TOKEN
+        self._occupied[i] = 0
+        self._free[self._size[i]].append(i)
+
+    def _rebuild_free_pools(self) -> None:
+        # Pushed in reverse so the first locker of each size is handed out first
+        self._free = [array("l") for _ in _SIZES]
+        for i in range(len(self._size) - 1, -1, -1):
+            if not self._occupied[i]:
+                self._free[self._size[i]].append(i)
+
+    def _is_live_entry(self, entry: int) -> bool:
+        i = (entry >> 32) & _LOW_32
+        return self._token_code[i] != _NO_TOKEN and self._token_gen[i] == entry & _LOW_32
+
+    def _compact_expiry_heap(self) -> None:
+        # Same rule as LockerSystem: rebuild once stale entries outnumber live ones
+        if len(self._expiry_heap) <= 2 * len(self._locker_by_code):
+            return
+        self._expiry_heap = [entry for entry in self._expiry_heap if self._is_live_entry(entry)]
+        heapq.heapify(self._expiry_heap)
+
+    def _new_expiry(self) -> int:
+        return int(self._clock()) + AmazonLocker.token_valid_days * 24 * 60 * 60
+
+    def _token_view(self, i: int) -> AccessToken:
+        code = f"{self._token_code[i]:0{self._code_length}d}"
+        return AccessToken(code=code, expires_at=self._token_expiry[i], compartment=self._locker_view(i))
+
+    def _locker_view(self, i: int) -> Locker:
+        locker_id = self._ids[i] if self._ids is not None else f"L{i}"
+        return Locker(locker_id, _SIZES[self._size[i]], bool(self._occupied[i]))
+
+    def _require_staff(self, staff: Staff) -> None:
+        if staff is None or not staff.is_valid():
+            raise AuthorizationError("Unauthorized: only valid staff can perform this action.")
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from AmazonLocker import Locker
+
+
+class ActuatorDriver(ABC):
+    """Talks to the door hardware. open_door blocks until the door is open (or raises)."""
+
+    @abstractmethod
+    def open_door(self, locker: Locker) -> None:
+        ...
+
+
+class PrintActuatorDriver(ActuatorDriver):
+    """Default stand-in: same print as Locker.open()."""
+
+    def open_door(self, locker: Locker) -> None:
+        locker.open()
+
+
+class FakeActuatorDriver(ActuatorDriver):
+    """Local fake for tests/benchmarks: each open takes `latency_s` and is counted."""
+
+    def __init__(self, latency_s: float = 0.1):
+        self.latency_s = latency_s
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def open_door(self, locker: Locker) -> None:
+        time.sleep(self.latency_s)
+        with self._lock:
+            self.opened += 1
+
+
+class DoorQueue:
+    """
+    Fires door opens for one locker bank in the background, at most `max_parallel` at a time.
+
+    submit() returns right away with a Future that resolves to the Locker once its door is open
+    (or holds the driver's exception). LockerSystem commits token/locker state before submitting,
+    so a slow or failing door never holds up the bookkeeping.
+    """
+
+    def __init__(self, driver: ActuatorDriver, max_parallel: int = 8):
+        if max_parallel < 1:
+            raise ValueError("max_parallel must be at least 1")
+        self.driver = driver
+        self.max_parallel = max_parallel
+        self._pool = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="door")
+
+    def submit(self, locker: Locker) -> Future:
+        return self._pool.submit(self._open, locker)
+
+    def close(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _open(self, locker: Locker) -> Locker:
+        self.driver.open_door(locker)
+        return locker
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from AmazonLocker import (
+    AccessToken,
+    CodeAllocator,
+    KeyedPermutationCodeAllocator,
+    Locker,
+    LockerSystem,
+    Size,
+    Staff,
+)
+
+
+class ShardCodeAllocator(CodeAllocator):
+    """
+    Prefixes every code with the shard number, so the federation can route a pickup by reading the first digits.
+    The rest of the code comes from the wrapped allocator and stays unguessable.
+    """
+
+    def __init__(self, shard_id: int, prefix_width: int, inner: Optional[CodeAllocator] = None):
+        self.prefix = f"{shard_id:0{prefix_width}d}"
+        self._inner = inner or KeyedPermutationCodeAllocator()
+
+    def allocate(self) -> str:
+        return self.prefix + self._inner.allocate()
+
+    def release(self, code: str) -> None:
+        self._inner.release(code[len(self.prefix):])
+
+    def reserve(self, code: str) -> None:
+        self._inner.reserve(code[len(self.prefix):])
+
+
+class ShardClient(ABC):
+    """How the federation talks to one LockerSystem: a method name + args, same results as calling it directly."""
+
+    @abstractmethod
+    def call(self, method: str, *args: Any) -> Any:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class LocalShard(ShardClient):
+    """Shard in this process."""
+
+    def __init__(self, system: LockerSystem):
+        self.system = system
+
+    def call(self, method: str, *args: Any) -> Any:
+        return getattr(self.system, method)(*args)
+
+
+def _serve_shard(conn, lockers: List[Locker], shard_id: int, prefix_width: int, options: Dict[str, Any]) -> None:
+    # Runs in the child process: owns the LockerSystem and answers (method, args) requests until it gets None
+    system = LockerSystem(lockers, code_allocator=ShardCodeAllocator(shard_id, prefix_width), **options)
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        method, args = request
+        try:
+            conn.send((True, getattr(system, method)(*args)))
+        except Exception as e:
+            conn.send((False, e))
+    conn.close()
+
+
+class ProcessShard(ShardClient):
+    """
+    Shard in its own process, reached over a multiprocessing Pipe (local stand-in for the real IPC/RPC layer).
+    Results and exceptions are pickled back, so callers see the same return values / errors as LocalShard.
+    """
+
+    def __init__(self, lockers: List[Locker], shard_id: int, prefix_width: int, **options: Any):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve_shard, args=(child_conn, lockers, shard_id, prefix_width, options), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        # One request in flight per pipe
+        self._lock = threading.Lock()
+
+    def call(self, method: str, *args: Any) -> Any:
+        with self._lock:
+            self._conn.send((method, args))
+            ok, result = self._conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.send(None)
+            self._conn.close()
+        self._process.join()
+
+
+class LockerFederation:
+    """
+    Many locker banks (shards) behind one front door.
+
+    - Pickup: the shard number is the code prefix, so routing is O(1) (no shared token table).
+    - Insert: goes to the least-loaded of the requested site and its neighbors, using cached free counts per shard
+      (no round trip to compare shards). Our inserts decrement the cache and sweeps re-read the shard; pickups are
+      not counted, so call refresh_free_counts() on a timer. A stale count only costs a retry on the next candidate.
+    """
+
+    def __init__(self, shards: List[ShardClient], neighbors: Optional[Dict[int, List[int]]] = None):
+        if not shards:
+            raise ValueError("shards cannot be empty")
+
+        self.shards = shards
+        self.prefix_width = len(str(len(shards) - 1))
+        # shard -> nearby shards to balance inserts across (itself is always tried too)
+        self.neighbors: Dict[int, List[int]] = neighbors or {}
+
+        self._free_cache: List[Dict[Size, int]] = [{} for _ in shards]
+        self._cache_lock = threading.Lock()
+        self.refresh_free_counts()
+
+    @classmethod
+    def build(
+        cls,
+        banks: List[List[Locker]],
+        neighbors: Optional[Dict[int, List[int]]] = None,
+        processes: bool = False,
+        **options: Any,
+    ) -> LockerFederation:
+        """One shard per bank; `options` go to each LockerSystem (e.g. allow_upgrade=True)."""
+        prefix_width = len(str(len(banks) - 1))
+        shards: List[ShardClient] = []
+        for shard_id, lockers in enumerate(banks):
+            if processes:
+                shards.append(ProcessShard(lockers, shard_id, prefix_width, **options))
+            else:
+                allocator = ShardCodeAllocator(shard_id, prefix_width)
+                shards.append(LocalShard(LockerSystem(lockers, code_allocator=allocator, **options)))
+        return cls(shards, neighbors)
+
+    # Staff-only operations
+    def insert_package_into_locker(self, staff: Staff, package_size: Size, site: int) -> AccessToken:
+        candidates = [site] + [s for s in self.neighbors.get(site, []) if s != site]
+        with self._cache_lock:
+            candidates.sort(key=lambda s: -self._free_cache[s].get(package_size, 0))
+
+        for shard_id in candidates:
+            try:
+                token = self.shards[shard_id].call("insert_package_into_locker", staff, package_size)
+            except ValueError:
+                # Cache was stale: that shard is full for this size
+                self._set_free_count(shard_id, package_size, 0)
+                continue
+            with self._cache_lock:
+                cache = self._free_cache[shard_id]
+                size = token.get_compartment().size  # may be an upgraded size
+                cache[size] = max(cache.get(size, 0) - 1, 0)
+            return token
+
+        raise ValueError(f"No available locker of size {package_size.value} near site {site}")
+
+    def open_expired_packages(self, staff: Staff) -> List[Locker]:
+        opened: List[Locker] = []
+        for shard_id, shard in enumerate(self.shards):
+            opened.extend(shard.call("open_expired_packages", staff))
+            self._refresh_shard(shard_id)
+        return opened
+
+    # Customer operation
+    def pick_up_package(self, token_code: str, kiosk_id: str = "default") -> str:
+        prefix = token_code[:self.prefix_width]
+        if not prefix.isdigit() or int(prefix) >= len(self.shards):
+            return "invalid_token"
+        return self.shards[int(prefix)].call("pick_up_package", token_code, kiosk_id)
+
+    def free_count(self, size: Size, site: Optional[int] = None) -> int:
+        """Cached free lockers of that size, for one shard or the whole federation (no shard round trip)."""
+        with self._cache_lock:
+            if site is not None:
+                return self._free_cache[site].get(size, 0)
+            return sum(counts.get(size, 0) for counts in self._free_cache)
+
+    def refresh_free_counts(self) -> None:
+        for shard_id in range(len(self.shards)):
+            self._refresh_shard(shard_id)
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+    def _refresh_shard(self, shard_id: int) -> None:
+        counts = {size: self.shards[shard_id].call("free_count", size) for size in Size}
+        with self._cache_lock:
+            self._free_cache[shard_id] = counts
+
+    def _set_free_count(self, shard_id: int, size: Size, count: int) -> None:
+        with self._cache_lock:
+            self._free_cache[shard_id][size] = count
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from threading import Condition, Lock, Timer, local
+from typing import Dict, Iterable, List, Set, Tuple
+
+from AmazonLocker import AccessToken, Locker
+
+
+class LockerJournal:
+    """
+    Write-ahead log + snapshots for LockerSystem, so pickup codes survive a restart.
+
+    Files in `directory`:
+    - snapshot.json      -> every live token and failed door at the last checkpoint + which journal segment follows it
+    - journal-<gen>.log  -> one tab-separated line per insert / pickup / expire / door failure or clear since that
+                            snapshot (ids escaped)
+
+    Group commit (durable=True, the default): an insert / pickup / expiry returns only once its record is on disk (commit()).
+    Callers committing at the same time share one write + fsync: the first becomes the leader and writes
+    everything buffered so far; the others wait for it, and whatever arrives meanwhile goes in the next write.
+    A lone caller pays one fsync; under load each fsync covers many records.
+
+    durable=False trades that for speed: records are written `group_commit_size` at a time, and at most
+    `max_delay_s` after the first of a batch, so a crash can lose that much (call flush() before shutdown).
+
+    Usage:
+        journal = LockerJournal("locker_state")
+        system = LockerSystem(lockers, journal=journal)   # loads snapshot + replays the journal tail
+    """
+
+    SNAPSHOT_FILE = "snapshot.json"
+
+    def __init__(
+        self,
+        directory: str,
+        group_commit_size: int = 64,
+        checkpoint_every: int = 100_000,
+        fsync: bool = True,
+        durable: bool = True,
+        max_delay_s: float = 0.05,
+    ):
+        if group_commit_size < 1:
+            raise ValueError("group_commit_size must be at least 1")
+        if max_delay_s <= 0:
+            raise ValueError("max_delay_s must be positive")
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1")
+
+        self.directory = directory
+        self.group_commit_size = group_commit_size
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.durable = durable
+        self.max_delay_s = max_delay_s
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        self._buffer: List[str] = []
+        self._records_since_checkpoint = 0
+        # Group commit state (all under _lock): records appended / on disk so far, and whether a leader is writing
+        self._written = Condition(self._lock)
+        self._appended = 0
+        self._durable_upto = 0
+        self._writing = False
+        self._last_appended = local()  # per thread: number of its last record, what commit() waits for
+        self._delay_timer: Timer | None = None
+
+        # Snapshot is parsed once here and handed to load(); live: code -> (locker_id, expires_at)
+        self._generation, self._snapshot_tokens, self._snapshot_failed_doors = self._read_snapshot()
+        # A crash mid-write leaves a partial last line; cut it before appending, or the next record joins it
+        _truncate_torn_tail(self._journal_path(self._generation))
+        self._file = open(self._journal_path(self._generation), "a", encoding="utf-8")
+
+    # Called by LockerSystem
+    def record_insert(self, token: AccessToken) -> None:
+        locker = token.get_compartment()
+        self._append(f"I\t{_quote(token.get_code())}\t{_quote(locker.id)}\t{token.expires_at}\n")
+
+    def record_remove(self, code: str, expired: bool) -> None:
+        self._append(f"{'E' if expired else 'P'}\t{_quote(code)}\n")
+
+    def record_door_failed(self, locker_id: str) -> None:
+        self._append(f"F\t{_quote(locker_id)}\n")
+
+    def record_door_cleared(self, locker_id: str) -> None:
+        self._append(f"C\t{_quote(locker_id)}\n")
+
+    def checkpoint_due(self) -> bool:
+        return self._records_since_checkpoint >= self.checkpoint_every
+
+    def write_snapshot(self, tokens: List[AccessToken], failed_doors: Iterable[str] = ()) -> None:
+        """Caller must make sure no operation is in flight (LockerSystem.checkpoint holds all its locks)."""
+        with self._lock:
+            self._drain_locked()
+            new_generation = self._generation + 1
+
+            snapshot = {
+                "journal_generation": new_generation,
+                "tokens": [
+                    [t.get_code(), t.get_compartment().id, t.expires_at] for t in tokens
+                ],
+                "failed_doors": list(failed_doors),
+            }
+            path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            # Atomic switch: a crash before this line recovers from the old snapshot + old (complete) journal
+            os.replace(tmp_path, path)
+
+            self._file.close()
+            old_path = self._journal_path(self._generation)
+            self._generation = new_generation
+            self._file = open(self._journal_path(new_generation), "a", encoding="utf-8")
+            os.remove(old_path)
+            self._records_since_checkpoint = 0
+
+    def load(self, lockers: List[Locker]) -> Tuple[List[AccessToken], List[Locker]]:
+        """
+        Return the live tokens and the lockers whose door failed to open (still not cleared by staff):
+        latest snapshot with the journal tail replayed on top. O(snapshot + tail).
+        Meant to be called once, at startup (LockerSystem does this) and before anything new is recorded.
+        """
+        lockers_by_id = {locker.id: locker for locker in lockers}
+        live, self._snapshot_tokens = self._snapshot_tokens, {}
+        failed_doors, self._snapshot_failed_doors = self._snapshot_failed_doors, set()
+
+        with open(self._journal_path(self._generation), "r", encoding="utf-8") as f:
+            # Every line is complete: a torn tail was truncated when the journal was opened
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if "\\" in line:
+                    parts = [_unquote(part) for part in parts]
+                if parts[0] == "I":
+                    live[parts[1]] = (parts[2], int(parts[3]))
+                elif parts[0] == "F":
+                    failed_doors.add(parts[1])
+                elif parts[0] == "C":
+                    failed_doors.discard(parts[1])
+                else:
+                    live.pop(parts[1], None)
+
+        def known(locker_id: str) -> Locker:
+            locker = lockers_by_id.get(locker_id)
+            if locker is None:
+                raise ValueError(f"Journal references unknown locker: {locker_id}")
+            return locker
+
+        tokens = [
+            AccessToken(code=code, expires_at=expires_at, compartment=known(locker_id))
+            for code, (locker_id, expires_at) in live.items()
+        ]
+        return tokens, [known(locker_id) for locker_id in failed_doors]
+
+    def commit(self) -> None:
+        """
+        Wait until every record this thread appended is on disk (no-op with durable=False).
+        Called by LockerSystem after releasing its own locks, so nothing else waits on the fsync.
+        """
+        if not self.durable:
+            return
+        upto = getattr(self._last_appended, "seq", 0)
+        with self._lock:
+            while self._durable_upto < upto:
+                if self._writing:
+                    self._written.wait()
+                    continue
+                # Leader: take everything buffered so far (ours and the waiting followers') in one write + fsync
+                batch, self._buffer = self._buffer, []
+                batch_upto = self._appended
+                self._writing = True
+                self._lock.release()
+                written = False
+                try:
+                    self._write(batch)
+                    written = True
+                finally:
+                    self._lock.acquire()
+                    self._writing = False
+                    if written:
+                        self._durable_upto = batch_upto
+                    else:
+                        # Not on disk: put it back so no follower is told its record is durable
+                        self._buffer = batch + self._buffer
+                    self._written.notify_all()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._drain_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._drain_locked()
+            if self._delay_timer is not None:
+                self._delay_timer.cancel()
+            self._file.close()
+
+    def _append(self, line: str) -> None:
+        with self._lock:
+            self._buffer.append(line)
+            self._appended += 1
+            self._last_appended.seq = self._appended
+            self._records_since_checkpoint += 1
+            if self.durable:
+                return
+            if len(self._buffer) >= self.group_commit_size:
+                self._drain_locked()
+            elif len(self._buffer) == 1:
+                # First record of a batch: make sure it reaches disk within max_delay_s even if the bank goes quiet
+                self._delay_timer = Timer(self.max_delay_s, self._flush_if_open)
+                self._delay_timer.daemon = True
+                self._delay_timer.start()
+
+    def _flush_if_open(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._drain_locked()
+
+    def _drain_locked(self) -> None:
+        """Write out the buffer (after any leader's write in flight); caller holds _lock."""
+        while self._writing:
+            self._written.wait()
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+        self._durable_upto = self._appended
+
+    def _write(self, records: List[str]) -> None:
+        self._file.write("".join(records))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"journal-{generation}.log")
+
+    def _read_snapshot(self) -> Tuple[int, Dict[str, Tuple[str, int]], Set[str]]:
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0, {}, set()
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        tokens = {code: (locker_id, exp) for code, locker_id, exp in snapshot["tokens"]}
+        # Older snapshots have no failed_doors
+        return snapshot["journal_generation"], tokens, set(snapshot.get("failed_doors", []))
+
+
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+_ESCAPED = re.compile(r"\\(.)")
+
+
+def _quote(field: str) -> str:
+    # Locker ids come from the bank's config: escape anything that would split the record
+    for char, escaped in _ESCAPES.items():
+        field = field.replace(char, escaped)
+    return field
+
+
+def _unquote(field: str) -> str:
+    return _ESCAPED.sub(lambda m: _UNESCAPES[m.group(1)], field)
+
+
+def _truncate_torn_tail(path: str) -> None:
+    """Drop everything after the last newline in `path` (the partial record of a crashed write)."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,230 @@
+"""
+Headless traffic replay for LockerSystem.
+
+A trace is one day after another of: courier bulk drops in the morning, customer pickups spread over the next
+few days, a share of packages nobody collects (they expire and go out in the nightly sweep) and wrong-code noise.
+Time is simulated (the system's clock follows the trace), so a month of traffic replays in seconds.
+Sites are independent and run in parallel processes; latencies are wall-clock per call.
+
+Run:
+    python loadgen.py --sites 8 --days 30 --seed 1
+    python loadgen.py --record trace.tsv --days 7       # write site 0's trace
+    python loadgen.py --trace trace.tsv                 # replay a recorded trace
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from AmazonLocker import Locker, LockerSystem, Size, Staff
+from metrics import LatencyHistogram, LockerMetrics, latency_summary
+
+
+DAY = 24 * 60 * 60
+# Simulated time 0 of every trace (an arbitrary fixed epoch, so replays are reproducible)
+START_EPOCH = 1_700_000_000
+STAFF = Staff(id="S-LOADGEN", active=True)
+SIZE_BY_LETTER = {"S": Size.SMALL, "M": Size.MEDIUM, "L": Size.LARGE}
+
+# (seconds since trace start, op, arg):
+#   ("bulk", "SSML")      courier drop, one letter per package; packages are numbered in drop order
+#   ("pickup", "17")      customer collects package #17
+#   ("invalid", "123456") someone types a wrong code (re-drawn at replay if it is a live code at that moment)
+#   ("sweep", "")         staff opens expired lockers
+TraceEvent = Tuple[int, str, str]
+
+
+@dataclass(frozen=True)
+class TrafficProfile:
+    lockers_per_size: int = 2_000
+    packages_per_day: int = 1_200
+    couriers_per_day: int = 6
+    abandon_rate: float = 0.03
+    invalid_per_day: int = 300
+    max_pickup_delay_h: int = 72
+    size_mix: Tuple[float, float, float] = (0.6, 0.3, 0.1)  # S / M / L
+
+
+@dataclass
+class SiteResult:
+    site_id: int
+    operations: int
+    wall_s: float
+    counters: Dict[str, int]
+    histograms: Dict[str, LatencyHistogram]
+
+
+def generate_trace(profile: TrafficProfile, days: int, seed: int) -> List[TraceEvent]:
+    rng = random.Random(seed)
+    events: List[TraceEvent] = []
+    package_no = 0
+    per_courier = profile.packages_per_day // profile.couriers_per_day
+
+    for day in range(days):
+        base = day * DAY
+        # Drops between 07:00 and 10:00, numbered in time order (the order replay sees them)
+        for t in sorted(base + 7 * 3600 + rng.randrange(3 * 3600) for _ in range(profile.couriers_per_day)):
+            sizes = "".join(rng.choices("SML", weights=profile.size_mix, k=per_courier))
+            events.append((t, "bulk", sizes))
+            for _ in sizes:
+                if rng.random() >= profile.abandon_rate:
+                    delay = rng.randrange(600, profile.max_pickup_delay_h * 3600)
+                    events.append((t + delay, "pickup", str(package_no)))
+                package_no += 1
+
+        for _ in range(profile.invalid_per_day):
+            events.append((base + rng.randrange(DAY), "invalid", f"{rng.randrange(10 ** 6):06d}"))
+        events.append((base + 23 * 3600, "sweep", ""))
+
+    # Stable sort: a pickup never comes before its own drop (delay >= 10 min)
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def save_trace(events: List[TraceEvent], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for t, op, arg in events:
+            f.write(f"{t}\t{op}\t{arg}\n")
+
+
+def load_trace(path: str) -> List[TraceEvent]:
+    events: List[TraceEvent] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            t, op, arg = line.rstrip("\n").split("\t")
+            events.append((int(t), op, arg))
+    return events
+
+
+def replay(events: List[TraceEvent], profile: TrafficProfile, site_id: int = 0) -> SiteResult:
+    """Drive one fresh LockerSystem through `events` on simulated time."""
+    lockers = [
+        Locker(f"{size.value[0]}{i}", size) for size in Size for i in range(profile.lockers_per_size)
+    ]
+    sim_now = [START_EPOCH]
+    metrics = LockerMetrics()
+    system = LockerSystem(lockers, clock=lambda: sim_now[0], metrics=metrics)
+
+    # package number -> pickup code (None if the drop couldn't place it)
+    codes: List[Optional[str]] = []
+    not_stored = 0
+    redrawn = 0
+
+    # Locker.open() prints; keep the door log out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for t, op, arg in events:
+            sim_now[0] = START_EPOCH + t
+            if op == "bulk":
+                result = system.insert_packages_bulk(STAFF, [SIZE_BY_LETTER[c] for c in arg])
+                codes.extend(tok.get_code() if tok is not None else None for tok in result.tokens)
+            elif op == "pickup":
+                code = codes[int(arg)]
+                if code is None:
+                    not_stored += 1
+                    continue
+                system.pick_up_package(code, f"K{site_id}")
+            elif op == "invalid":
+                code = _wrong_code(arg, system)
+                redrawn += code != arg
+                system.pick_up_package(code, f"K{site_id}")
+            elif op == "sweep":
+                system.open_expired_packages(STAFF)
+            else:
+                raise ValueError(f"Unknown trace op: {op}")
+        wall_s = time.perf_counter() - start
+
+    counters = metrics.counters()
+    counters["replay.pickup_of_unstored_package"] = not_stored
+    counters["replay.noise_code_redrawn"] = redrawn
+    histograms = metrics.histograms()
+    operations = sum(h.total() for h in histograms.values())
+    return SiteResult(site_id, operations, wall_s, counters, histograms)
+
+
+def _wrong_code(code: str, system: LockerSystem) -> str:
+    """
+    Noise codes are drawn when the trace is generated, before the real codes exist, so one can match a live code
+    (and pick up a real package). Step to the next code not live right now; deterministic, so replays still match.
+    """
+    live = system._tokens_by_code
+    width = len(code)
+    while code in live:
+        code = f"{(int(code) + 1) % 10 ** width:0{width}d}"
+    return code
+
+
+def run_site(profile: TrafficProfile, days: int, seed: int, site_id: int) -> SiteResult:
+    # Each site gets its own reproducible trace
+    return replay(generate_trace(profile, days, seed * 1_000_003 + site_id), profile, site_id)
+
+
+def run_sites(profile: TrafficProfile, sites: int, days: int, seed: int, processes: Optional[int] = None) -> List[SiteResult]:
+    args = [(profile, days, seed, site_id) for site_id in range(sites)]
+    if sites == 1 or processes == 1:
+        return [run_site(*a) for a in args]
+    with multiprocessing.Pool(processes or min(sites, os.cpu_count() or 1)) as pool:
+        return pool.starmap(run_site, args)
+
+
+def print_report(results: List[SiteResult], wall_s: float, sim_days: float) -> None:
+    counters: Dict[str, int] = {}
+    histograms: Dict[str, LatencyHistogram] = {}
+    for r in results:
+        for key, count in r.counters.items():
+            counters[key] = counters.get(key, 0) + count
+        for op, h in r.histograms.items():
+            histograms.setdefault(op, LatencyHistogram()).merge(h)
+
+    operations = sum(r.operations for r in results)
+    print(f"\n{len(results)} site(s), {sim_days:.0f} simulated day(s), {operations} operations in {wall_s:.2f} s")
+    print(f" - throughput {operations / wall_s:,.0f} ops/s overall, "
+          f"{sum(r.operations / r.wall_s for r in results) / len(results):,.0f} ops/s per site")
+    print("\nlatency (us):")
+    for op, stats in sorted(latency_summary(histograms).items()):
+        print(f" - {op:<27} n={stats['count']:<9} p50 {stats['p50']:7.2f}  p90 {stats['p90']:7.2f}  "
+              f"p99 {stats['p99']:7.2f}  max {stats['max']:9.2f}")
+    print("\noutcomes:")
+    for key in sorted(counters):
+        print(f" - {key:<45} {counters[key]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay simulated locker traffic against LockerSystem.")
+    parser.add_argument("--sites", type=int, default=4)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=None, help="default: one per site, up to the CPU count")
+    parser.add_argument("--lockers-per-size", type=int, default=TrafficProfile.lockers_per_size)
+    parser.add_argument("--packages-per-day", type=int, default=TrafficProfile.packages_per_day)
+    parser.add_argument("--trace", help="replay this recorded trace (one site) instead of generating traffic")
+    parser.add_argument("--record", help="write site 0's generated trace to this file and exit")
+    args = parser.parse_args()
+
+    profile = TrafficProfile(lockers_per_size=args.lockers_per_size, packages_per_day=args.packages_per_day)
+
+    if args.record:
+        events = generate_trace(profile, args.days, args.seed * 1_000_003)
+        save_trace(events, args.record)
+        print(f"wrote {len(events)} events to {args.record}")
+        return
+
+    start = time.perf_counter()
+    if args.trace:
+        events = load_trace(args.trace)
+        results = [replay(events, profile)]
+        sim_days = (events[-1][0] / DAY) if events else 0
+    else:
+        results = run_sites(profile, args.sites, args.days, args.seed, args.processes)
+        sim_days = args.days
+    print_report(results, time.perf_counter() - start, sim_days)
+
+
+if __name__ == "__main__":
+    main()
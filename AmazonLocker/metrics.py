@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from AmazonLocker import AuthorizationError, LockerSystem, Size
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond values: exact below 16, then 8 sub-buckets per power of two
+    (about 6% relative error), so any latency from ns to hours fits in a few hundred ints.
+    """
+
+    _SUB_BUCKETS = 8
+    _BUCKETS = 16 + 64 * _SUB_BUCKETS
+
+    def __init__(self):
+        self.counts: List[int] = [0] * self._BUCKETS
+
+    def record(self, value_ns: int) -> None:
+        self.counts[self._index(value_ns)] += 1
+
+    def merge(self, other: LatencyHistogram) -> None:
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, p: float) -> int:
+        """Upper edge (ns) of the bucket holding the p-th percentile, 0 if empty."""
+        total = self.total()
+        if total == 0:
+            return 0
+        rank = max(1, int(total * p / 100 + 0.5))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self._upper_edge(i)
+        return self._upper_edge(self._BUCKETS - 1)
+
+    @classmethod
+    def _index(cls, v: int) -> int:
+        if v < 16:
+            return max(v, 0)
+        shift = v.bit_length() - 4  # v >> shift is in [8, 15]
+        return min(16 + (shift - 1) * cls._SUB_BUCKETS + (v >> shift) - 8, cls._BUCKETS - 1)
+
+    @classmethod
+    def _upper_edge(cls, i: int) -> int:
+        if i < 16:
+            return i
+        shift, sub = divmod(i - 16, cls._SUB_BUCKETS)
+        return ((sub + 9) << (shift + 1)) - 1
+
+
+def latency_summary(histograms: Dict[str, LatencyHistogram]) -> Dict[str, Dict[str, float]]:
+    """count + p50/p90/p99/max in microseconds per operation."""
+    return {
+        op: {
+            "count": h.total(),
+            "p50": h.percentile(50) / 1000,
+            "p90": h.percentile(90) / 1000,
+            "p99": h.percentile(99) / 1000,
+            "max": h.percentile(100) / 1000,
+        }
+        for op, h in histograms.items()
+    }
+
+
+class _ThreadRecorder:
+    """One per thread, so recording never takes a lock or races another thread."""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.latency: Dict[str, LatencyHistogram] = {}
+
+
+class LockerMetrics:
+    """
+    Operation metrics for a LockerSystem: counts by outcome, latency histograms per operation,
+    and free/occupied gauges per Size.
+
+    attach() wraps the public operations on that one instance; detach() removes the wrappers, so a system
+    without metrics runs exactly the original code (zero cost when off). Each thread records into its own
+    counters/histograms; snapshot() merges them without stopping the hot path (a snapshot taken mid-operation
+    may be off by that one in-flight operation).
+    """
+
+    _OPERATIONS = ("insert_package_into_locker", "insert_packages_bulk", "pick_up_package", "open_expired_packages")
+
+    def __init__(self, clock_ns: Callable[[], int] = time.perf_counter_ns):
+        self._clock_ns = clock_ns
+        self._local = threading.local()
+        self._recorders: List[_ThreadRecorder] = []
+        self._recorders_lock = threading.Lock()  # only taken when a new thread records for the first time
+        self._system: LockerSystem | None = None
+        self._lockers_per_size: Dict[Size, int] = {}
+
+    def attach(self, system: LockerSystem) -> None:
+        if self._system is not None:
+            raise ValueError("LockerMetrics is already attached to a LockerSystem")
+        self._system = system
+        self._lockers_per_size = {size: 0 for size in Size}
+        for locker in system.lockers:
+            self._lockers_per_size[locker.size] += 1
+        for name in self._OPERATIONS:
+            setattr(system, name, self._wrap(name, getattr(system, name)))
+
+    def detach(self) -> None:
+        if self._system is None:
+            return
+        for name in self._OPERATIONS:
+            self._system.__dict__.pop(name, None)
+        self._system = None
+
+    def counters(self) -> Dict[str, int]:
+        """Counters merged across threads."""
+        counters: Dict[str, int] = {}
+        for recorder in self._all_recorders():
+            for key, count in list(recorder.counters.items()):
+                counters[key] = counters.get(key, 0) + count
+        return counters
+
+    def histograms(self) -> Dict[str, LatencyHistogram]:
+        """Latency histograms per operation, merged across threads (copies, safe to merge further)."""
+        latency: Dict[str, LatencyHistogram] = {}
+        for recorder in self._all_recorders():
+            for op, histogram in list(recorder.latency.items()):
+                latency.setdefault(op, LatencyHistogram()).merge(histogram)
+        return latency
+
+    def snapshot(self) -> Dict[str, Any]:
+        occupancy: Dict[str, Dict[str, int]] = {}
+        if self._system is not None:
+            for size, total in self._lockers_per_size.items():
+                free = self._system.free_count(size)
+                occupancy[size.value] = {"free": free, "occupied": total - free}
+
+        return {
+            "counters": self.counters(),
+            "latency_us": latency_summary(self.histograms()),
+            "occupancy": occupancy,
+        }
+
+    def _all_recorders(self) -> List[_ThreadRecorder]:
+        with self._recorders_lock:
+            return list(self._recorders)
+
+    def _recorder(self) -> _ThreadRecorder:
+        recorder = getattr(self._local, "recorder", None)
+        if recorder is None:
+            recorder = _ThreadRecorder()
+            self._local.recorder = recorder
+            with self._recorders_lock:
+                self._recorders.append(recorder)
+        return recorder
+
+    def _record(self, op: str, outcome: str, elapsed_ns: int, amount: int = 1) -> None:
+        recorder = self._recorder()
+        key = f"{op}.{outcome}"
+        recorder.counters[key] = recorder.counters.get(key, 0) + amount
+        histogram = recorder.latency.get(op)
+        if histogram is None:
+            histogram = recorder.latency[op] = LatencyHistogram()
+        histogram.record(elapsed_ns)
+
+    def _wrap(self, op: str, method: Callable) -> Callable:
+        clock_ns = self._clock_ns
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = clock_ns()
+            try:
+                result = method(*args, **kwargs)
+            except AuthorizationError:
+                self._record(op, "unauthorized", clock_ns() - start)
+                raise
+            except ValueError:
+                # "No available locker" / out of codes
+                self._record(op, "no_available_locker", clock_ns() - start)
+                raise
+
+            elapsed = clock_ns() - start
+            if op == "pick_up_package":
+                self._record(op, result, elapsed)
+            elif op == "open_expired_packages":
+                self._record(op, "ok", elapsed)
+                recorder = self._recorder()
+                recorder.counters["open_expired_packages.lockers_opened"] = (
+                    recorder.counters.get("open_expired_packages.lockers_opened", 0) + len(result)
+                )
+            elif op == "insert_packages_bulk":
+                self._record(op, "ok", elapsed)
+                recorder = self._recorder()
+                for outcome, amount in (("packages_stored", len(result.tokens) - len(result.failures)),
+                                        ("packages_failed", len(result.failures))):
+                    key = f"{op}.{outcome}"
+                    recorder.counters[key] = recorder.counters.get(key, 0) + amount
+            else:
+                self._record(op, "ok", elapsed)
+            return result
+
+        return timed
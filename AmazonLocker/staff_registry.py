@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Set, Tuple
+
+from AmazonLocker import Staff
+
+
+class StaffDirectory(ABC):
+    """Source of truth for who is staff (HR / identity backend). Lookups are assumed to be slow."""
+
+    @abstractmethod
+    def is_active(self, staff_id: str) -> bool:
+        ...
+
+
+class FakeStaffDirectory(StaffDirectory):
+    """Local fake: a set of active ids, each lookup takes `latency_s` (and is counted)."""
+
+    def __init__(self, active_ids: Iterable[str] = (), latency_s: float = 0.01):
+        self.latency_s = latency_s
+        self.lookups = 0
+        self._active: Set[str] = set(active_ids)
+        self._lock = threading.Lock()
+
+    def is_active(self, staff_id: str) -> bool:
+        time.sleep(self.latency_s)
+        with self._lock:
+            self.lookups += 1
+            return staff_id in self._active
+
+    def add(self, staff_id: str) -> None:
+        with self._lock:
+            self._active.add(staff_id)
+
+    def remove(self, staff_id: str) -> None:
+        with self._lock:
+            self._active.discard(staff_id)
+
+
+class StaffRegistry:
+    """
+    Central staff check for LockerSystem, with an in-process cache of decisions.
+
+    - is_authorized(staff): cached yes/no per staff id for `ttl_s` seconds, so bulk inserts and sweeps
+      don't hit the directory on every call.
+    - revoke(staff_id): takes effect immediately (cache entry dropped and a "no" pinned), not after the TTL.
+    Only this process's cache is invalidated; other processes see a revocation within `ttl_s` at most.
+    """
+
+    def __init__(self, directory: StaffDirectory, ttl_s: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        if ttl_s < 0:
+            raise ValueError("ttl_s cannot be negative")
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self._clock = clock
+
+        # staff_id -> (authorized, valid until)
+        self._decisions: Dict[str, Tuple[bool, float]] = {}
+        self._revoked: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def is_authorized(self, staff: Staff) -> bool:
+        now = self._clock()
+        with self._lock:
+            if staff.id in self._revoked:
+                return False
+            cached = self._decisions.get(staff.id)
+            if cached is not None and now < cached[1]:
+                return cached[0]
+
+        # Directory lookup outside the lock so one slow lookup doesn't block every other kiosk
+        authorized = self.directory.is_active(staff.id)
+        with self._lock:
+            if staff.id in self._revoked:
+                return False  # revoked while we were looking it up
+            self._decisions[staff.id] = (authorized, now + self.ttl_s)
+        return authorized
+
+    def revoke(self, staff_id: str) -> None:
+        with self._lock:
+            self._revoked.add(staff_id)
+            self._decisions.pop(staff_id, None)
+
+    def restore(self, staff_id: str) -> None:
+        """Undo a local revoke; the next check asks the directory again."""
+        with self._lock:
+            self._revoked.discard(staff_id)
+            self._decisions.pop(staff_id, None)
+
+    def invalidate(self, staff_id: str) -> None:
+        with self._lock:
+            self._decisions.pop(staff_id, None)
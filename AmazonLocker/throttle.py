@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key (`burst` failures allowed at once, refilled at `rate_per_s`).
+
+    Memory is bounded: at most `max_keys` buckets, least recently used evicted first. A key only gets a bucket
+    after its first failure, so normal traffic never allocates anything here.
+    """
+
+    def __init__(
+        self,
+        rate_per_s: float,
+        burst: int,
+        max_keys: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate_per_s <= 0 or burst < 1 or max_keys < 1:
+            raise ValueError("rate_per_s must be > 0, burst and max_keys at least 1")
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+
+        # key -> (tokens left, time of last update)
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def blocked(self, key: str) -> bool:
+        """True if `key` has used up its budget. Doesn't consume anything."""
+        # No lock on this hot path: a dict read is atomic and buckets are immutable tuples
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return False
+        return self._refill(bucket, self._clock()) < 1
+
+    def record_failure(self, key: str) -> None:
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = self.burst if bucket is None else self._refill(bucket, now)
+            self._buckets[key] = (tokens - 1, now)  # re-inserted at the end = most recently used
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _refill(self, bucket: Tuple[float, float], now: float) -> float:
+        tokens, last = bucket
+        return min(self.burst, tokens + (now - last) * self.rate_per_s)
+
+
+class PickupThrottle:
+    """
+    Brute-force guard for pick_up_package: failed codes are charged to the kiosk and to the whole bank.
+    Once either budget is used up, attempts are rejected before the token table is looked at.
+    Successful pickups are free, so legitimate customers only pay for the two `blocked` checks.
+    """
+
+    BANK_KEY = "*bank*"
+
+    def __init__(
+        self,
+        per_kiosk: Optional[TokenBucketLimiter] = None,
+        per_bank: Optional[TokenBucketLimiter] = None,
+    ):
+        # Defaults: a kiosk gets 5 wrong codes in a row, then one per 10 s; the bank 100, then 2 per second
+        # (`is None`, not `or`: a limiter with no buckets yet has len() 0 and is falsy)
+        if per_kiosk is None:
+            per_kiosk = TokenBucketLimiter(rate_per_s=0.1, burst=5)
+        if per_bank is None:
+            per_bank = TokenBucketLimiter(rate_per_s=2.0, burst=100, max_keys=1)
+        self.per_kiosk = per_kiosk
+        self.per_bank = per_bank
+
+    def blocked(self, kiosk_id: str) -> bool:
+        return self.per_kiosk.blocked(kiosk_id) or self.per_bank.blocked(self.BANK_KEY)
+
+    def record_failure(self, kiosk_id: str) -> None:
+        self.per_kiosk.record_failure(kiosk_id)
+        self.per_bank.record_failure(self.BANK_KEY)
@@ -1,10 +1,26 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import time
 import uuid
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager, nullcontext
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Tuple
+from threading import Lock
+from typing import TYPE_CHECKING, ContextManager, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional: occupancy_array() falls back to bytes
+    np = None
+
+from tariff import Tariff, TariffSchedule
+
+if TYPE_CHECKING:
+    from analytics import ClosedTicketLog
+    from journal import ParkingLotJournal, TicketRecord
 
 
 class VehicleType(Enum):
@@ -38,44 +54,291 @@ class Ticket:
     entry_time_ms: int
 
 
+# Crockford base32: no I/L/O/U, so printed ticket codes can't be misread
+_TICKET_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_TICKET_DIGITS = {c: i for i, c in enumerate(_TICKET_ALPHABET)}
+
+
+def encode_ticket_id(number: int) -> str:
+    """Short printable form of a compact ticket number (1 -> "1", 10**6 -> "YGJ0")."""
+    if number < 0:
+        raise ValueError("ticket number cannot be negative")
+    chars = []
+    while True:
+        number, digit = divmod(number, 32)
+        chars.append(_TICKET_ALPHABET[digit])
+        if number == 0:
+            return "".join(reversed(chars))
+
+
+def decode_ticket_id(code: str) -> int:
+    number = 0
+    for c in code.strip().upper():
+        digit = _TICKET_DIGITS.get(c)
+        if digit is None:
+            raise ValueError(f"Invalid ticket code: {code}")
+        number = number * 32 + digit
+    return number
+
+
+class CompactTicket:
+    """
+    Ticket for compact_tickets=True: an integer number (printed via encode_ticket_id only when shown)
+    and the spot as its ordinal (ParkingLot.slot_by_ordinal gives back (level_id, spot_id)).
+    """
+
+    __slots__ = ("number", "vehicle", "spot", "entry_time_ms")
+
+    def __init__(self, number: int, vehicle: Vehicle, spot: int, entry_time_ms: int):
+        self.number = number
+        self.vehicle = vehicle
+        self.spot = spot
+        self.entry_time_ms = entry_time_ms
+
+    @property
+    def id(self) -> str:
+        return encode_ticket_id(self.number)
+
+    def __repr__(self) -> str:
+        return f"CompactTicket(id={self.id!r}, vehicle={self.vehicle!r}, spot={self.spot}, entry_time_ms={self.entry_time_ms})"
+
+
+AnyTicket = Union[Ticket, CompactTicket]
+
+# Fallback matrix for ParkingLot(fallback_spot_types=...): a vehicle may take a larger spot when its own kind is full
+SMALLER_FITS_LARGER: Dict[VehicleType, List[VehicleType]] = {
+    VehicleType.MOTORCYCLE: [VehicleType.CAR, VehicleType.TRUCK],
+    VehicleType.CAR: [VehicleType.TRUCK],
+    VehicleType.TRUCK: [],
+}
+
+
 class ParkingLotError(Exception):
     pass
 
 
+class SpotPool(ABC):
+    """Free spots of one VehicleType. pop() decides which spot the next driver gets."""
+
+    @abstractmethod
+    def pop(self) -> Tuple[str, str]:
+        ...
+
+    @abstractmethod
+    def append(self, slot: Tuple[str, str]) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, slot: Tuple[str, str]) -> None:
+        """Take a free spot out of the pool (spot closed / drained / re-striped)."""
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class LifoSpotPool(SpotPool):
+    """Stack: the most recently freed (or last built) spot goes out first. O(1) pop/append/remove."""
+
+    def __init__(self):
+        # Insertion-ordered dict used as a stack: popitem() takes the last one in, del removes any spot
+        self._slots: Dict[Tuple[str, str], None] = {}
+
+    def pop(self) -> Tuple[str, str]:
+        return self._slots.popitem()[0]
+
+    def append(self, slot: Tuple[str, str]) -> None:
+        self._slots[slot] = None
+
+    def remove(self, slot: Tuple[str, str]) -> None:
+        del self._slots[slot]
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+class NearestSpotPool(SpotPool):
+    """
+    Min-heap on a priority per slot (e.g. walking distance from the entrance; lower = handed out first).
+    O(log n) pop/append. Equal priorities fall back to comparing (level_id, spot_id), so the order is deterministic.
+    remove() is O(1) and lazy: the entry stays in the heap and is skipped when it reaches the top.
+    Re-adding a removed slot reuses that entry if its priority is unchanged; otherwise a new entry (next version)
+    is pushed and the old one is skipped as stale.
+    """
+
+    def __init__(self, priority: Dict[Tuple[str, str], float]):
+        self._priority = priority
+        self._heap: List[Tuple[float, Tuple[str, str], int]] = []
+        # slot -> (priority, version) of its current heap entry; any other entry for the slot is stale
+        self._entries: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._versions = itertools.count()
+        self._removed: Set[Tuple[str, str]] = set()
+
+    def pop(self) -> Tuple[str, str]:
+        while True:
+            _, slot, version = heapq.heappop(self._heap)
+            entry = self._entries.get(slot)
+            if entry is None or entry[1] != version:
+                continue  # superseded when the slot was re-added with a new priority
+            del self._entries[slot]
+            if slot not in self._removed:
+                return slot
+            self._removed.discard(slot)
+
+    def append(self, slot: Tuple[str, str]) -> None:
+        priority = self._priority.get(slot)
+        if priority is None:
+            raise ValueError(f"No priority configured for spot {slot}")
+        if slot in self._removed:
+            self._removed.discard(slot)
+            if self._entries[slot][0] == priority:
+                # Still in the heap from before its removal, at the right priority: just make it live again
+                return
+        version = next(self._versions)
+        self._entries[slot] = (priority, version)
+        heapq.heappush(self._heap, (priority, slot, version))
+
+    def remove(self, slot: Tuple[str, str]) -> None:
+        self._removed.add(slot)
+
+    def __len__(self) -> int:
+        return len(self._entries) - len(self._removed)
+
+
+def entrance_order_priority(levels: List[Level]) -> Dict[Tuple[str, str], float]:
+    """Default distances: levels in the order given (entrance level first), then spots in listed order."""
+    priority: Dict[Tuple[str, str], float] = {}
+    rank = 0
+    for level in levels:
+        for spot in level.parkingspots:
+            priority[(level.id, spot.id)] = rank
+            rank += 1
+    return priority
+
+
 class ParkingLot:
     """
     maintain free spot lists per vehicle type.
 
-    - entry_into_lot: pop from relevant free list (O(1))
-    - exit_lot: append back to relevant free list (O(1))
+    - entry_into_lot: pop from relevant free list (O(1), or O(log n) with spot_priority)
+    - exit_lot: append back to relevant free list (O(1), or O(log n) with spot_priority)
     - display_availability: len(free_list) (O(1))
+    - display_level_availability: per-level-per-type counter (O(1))
+
+    spot_priority: (level_id, spot_id) -> distance/priority. When given, each type's pool is a min-heap and
+    drivers get the nearest free spot (see entrance_order_priority). None keeps the LIFO stack.
 
     occupied_spot is a dict: vehicle_id -> Ticket (so we can validate exits, prevent duplicates)
+
+    compact_tickets=True issues CompactTicket instead: a counter number instead of a uuid4 string,
+    __slots__ instead of a dataclass, and the spot as an int ordinal instead of a (level_id, spot_id) tuple.
+
+    Thread safety (thread_safe=True, one thread per gate):
+    - one lock per VehicleType pool: guards that pool and the bitmap/counters of its spots
+    - vehicle locks striped by vehicle id (vehicle_shards of them): make the duplicate check + insert into
+      occupied_spot one step, so two gates can't both admit the same vehicle
+    A car entering never waits on a truck leaving. Nested locks always go vehicle -> type.
+    With thread_safe=False every lock is a no-op context manager.
+
+    fallback_spot_types: vehicle type -> other spot types it may use, in order, when its own pool is empty
+    (e.g. SMALLER_FITS_LARGER). Exact fit is always tried first and each fallback is one O(1) pool check;
+    on exit the spot goes back to the pool of its own type. fallback_counts[(vehicle, spot)] counts fallbacks.
+
+    Fees come from a Tariff (see tariff.py): pass tariff=Tariff(schedule) for peak/weekend/cap/free-minutes rules,
+    or just hourly_rate_cents for the flat schedule (every started hour, minimum 1 hour).
+
+    journal=ParkingLotJournal(dir): every entry/exit is on disk before it returns (group commit) and on startup the latest
+    snapshot + journal tail is loaded back, so parked vehicles and their tickets survive a restart.
+
+    Runtime reconfiguration (add_level / add_spot / drain_* / reopen_* / close_* / restripe_spot) changes the
+    layout while vehicles are parked, in time proportional to the spots touched. Drained spots are never handed
+    out again (until reopened); their vehicles leave normally. Spots added to an existing level get ordinals at
+    the end of the bitmap. self.levels always reflects the current layout. Reconfiguration is not journaled:
+    save self.levels (and spot_priority) after changing the layout and build the restarted lot from them.
     """
 
-    def __init__(self, parking_lot_levels: List[Level], hourly_rate_cents: int = 0):
+    def __init__(
+        self,
+        parking_lot_levels: List[Level],
+        hourly_rate_cents: int = 0,
+        spot_priority: Optional[Dict[Tuple[str, str], float]] = None,
+        thread_safe: bool = False,
+        vehicle_shards: int = 16,
+        compact_tickets: bool = False,
+        journal: Optional[ParkingLotJournal] = None,
+        tariff: Optional[Tariff] = None,
+        history: Optional[ClosedTicketLog] = None,
+        fallback_spot_types: Optional[Dict[VehicleType, List[VehicleType]]] = None,
+    ):
         if not parking_lot_levels:
             raise ValueError("parking_lot_levels cannot be empty")
         if hourly_rate_cents < 0:
             raise ValueError("hourly_rate_cents cannot be negative")
+        if vehicle_shards < 1:
+            raise ValueError("vehicle_shards must be at least 1")
+        if tariff is not None and hourly_rate_cents:
+            raise ValueError("Pass either hourly_rate_cents or tariff, not both")
 
-        self.levels = parking_lot_levels
+        self.levels = list(parking_lot_levels)  # every reconfiguration call keeps this in step
         self.hourly_rate_cents = hourly_rate_cents
+        # Flat rate is just the simplest schedule
+        self.tariff = tariff or Tariff(TariffSchedule.flat(hourly_rate_cents))
 
-        # Free spot pools (stack behavior using list.pop()).
+        # Free spot pools, one per vehicle type: a stack (LIFO) by default, a nearest-first heap with spot_priority.
         # Each slot is stored as: (level_id, spot_id)
-        self.empty_motorcycle_spots: List[Tuple[str, str]] = []
-        self.empty_car_spots: List[Tuple[str, str]] = []
-        self.empty_truck_spots: List[Tuple[str, str]] = []
+        self.spot_priority = spot_priority
+        self.empty_motorcycle_spots: SpotPool = self._new_pool()
+        self.empty_car_spots: SpotPool = self._new_pool()
+        self.empty_truck_spots: SpotPool = self._new_pool()
 
-        # vehicle_id -> Ticket
-        self.occupied_spot: Dict[str, Ticket] = {}
+        # vehicle_id -> Ticket (CompactTicket with compact_tickets=True)
+        self.occupied_spot: Dict[str, AnyTicket] = {}
+        self.compact_tickets = compact_tickets
+        # Compact ticket numbers; next() on a count is atomic, so gates can share it without a lock
+        self._ticket_numbers = itertools.count(1)
 
         # (level_id, spot_id) -> VehicleType (helps validate & release correctly)
         self.spot_type_by_slot: Dict[Tuple[str, str], VehicleType] = {}
 
+        # Occupancy bitmap: one byte per spot, indexed by spot ordinal (0..n-1, levels laid out back to back,
+        # so each level is a contiguous range). Plus free counters per level per type for the entrance signs.
+        self.spot_ordinal: Dict[Tuple[str, str], int] = {}
+        self.slot_by_ordinal: List[Tuple[str, str]] = []
+        self.level_range: Dict[str, Tuple[int, int]] = {}  # level_id -> (first ordinal, end ordinal)
+        self._occupied = bytearray()
+        self._free_by_level: Dict[str, Dict[VehicleType, int]] = {}
+        # level_id -> ordinals of spots added to the level after it was built (outside its level_range)
+        self._extra_ordinals: Dict[str, List[int]] = {}
+        self._spots_per_level: Dict[str, int] = {}
+        # Drained spots: not in any pool; an occupied one stays out of the pool when its vehicle leaves
+        self._out_of_service: Set[Tuple[str, str]] = set()
+
+        self.thread_safe = thread_safe
+        new_lock = Lock if thread_safe else nullcontext
+        self._type_locks: Dict[VehicleType, ContextManager] = {t: new_lock() for t in VehicleType}
+        self._vehicle_locks: List[ContextManager] = [new_lock() for _ in range(vehicle_shards)]
+
         self.__update_empty_spots__()
 
+        # Spot types to try per vehicle type: exact fit, then the configured fallbacks.
+        # fallback_counts is only touched under the used spot type's lock.
+        fallback_spot_types = fallback_spot_types or {}
+        self._spot_types_to_try: Dict[VehicleType, List[VehicleType]] = {
+            t: [t] + [f for f in fallback_spot_types.get(t, []) if f != t] for t in VehicleType
+        }
+        self.fallback_counts: Dict[Tuple[VehicleType, VehicleType], int] = {
+            (t, f): 0 for t, types in self._spot_types_to_try.items() for f in types[1:]
+        }
+
+        # Optional closed-ticket history for reporting (see analytics.py). None means nothing is kept after exit.
+        self.history = history
+
+        # Optional write-ahead log (see journal.py). None means state is in memory only.
+        self._journal = journal
+        if journal is not None:
+            self._restore_tickets(journal.load())
+
     # Tradeoff:
     # - If you store free spots, entry/exit are O(1) and availability is O(1).
     # - If you store occupied-only, you often need a scan to find free slots (O(n)) unless you add extra indexing.
@@ -83,84 +346,436 @@ class ParkingLot:
     def __update_empty_spots__(self) -> None:
         """Build the free spot pools from levels (initial state assumes everything is empty)."""
         for level in self.levels:
-            for spot in level.parkingspots:
-                slot = (level.id, spot.id)
-                if slot in self.spot_type_by_slot:
-                    raise ValueError(f"Duplicate spot found: {slot}")
-
-                self.spot_type_by_slot[slot] = spot.type
-
-                if spot.type == VehicleType.MOTORCYCLE:
-                    self.empty_motorcycle_spots.append(slot)
-                elif spot.type == VehicleType.CAR:
-                    self.empty_car_spots.append(slot)
-                elif spot.type == VehicleType.TRUCK:
-                    self.empty_truck_spots.append(slot)
-                else:
-                    raise ValueError(f"Unknown spot type: {spot.type}")
-
-    def entry_into_lot(self, vehicle: Vehicle) -> Ticket:
+            self._open_level(level)
+
+    def _open_level(self, level: Level) -> None:
+        """Give the level a contiguous block of ordinals and put all its spots in the free pools."""
+        if level.id in self.level_range:
+            raise ValueError(f"Duplicate level found: {level.id}")
+        seen = set()
+        for spot in level.parkingspots:
+            if spot.id in seen:
+                raise ValueError(f"Duplicate spot found: {(level.id, spot.id)}")
+            if not isinstance(spot.type, VehicleType):
+                raise ValueError(f"Unknown spot type: {spot.type}")
+            seen.add(spot.id)
+
+        first = len(self.slot_by_ordinal)
+        self._free_by_level[level.id] = {t: 0 for t in VehicleType}
+        self._extra_ordinals[level.id] = []
+        self._spots_per_level[level.id] = 0
+        for spot in level.parkingspots:
+            self._add_spot(level.id, spot)
+        self.level_range[level.id] = (first, len(self.slot_by_ordinal))
+
+    def _add_spot(self, level_id: str, spot: ParkingSpot) -> None:
+        slot = (level_id, spot.id)
+        # Bitmap first: if growing it fails, no index map points past its end
+        self._occupied.append(0)
+        self.spot_type_by_slot[slot] = spot.type
+        self.spot_ordinal[slot] = len(self.slot_by_ordinal)
+        self.slot_by_ordinal.append(slot)
+        self._spots_per_level[level_id] += 1
+        self._free_by_level[level_id][spot.type] += 1
+        self._get_free_list(spot.type).append(slot)
+
+    def entry_into_lot(self, vehicle: Vehicle) -> AnyTicket:
         if not vehicle.id:
             raise ParkingLotError("Vehicle id cannot be empty")
 
-        # Avoid multiple entries for same vehicle
-        if vehicle.id in self.occupied_spot:
-            raise ParkingLotError("Vehicle already exists in the Parking Lot")
-
-        free_list = self._get_free_list(vehicle.type)
-
-        if not free_list:
-            raise ParkingLotError(f"No available parking slots for {vehicle.type.value}")
-
-        parking_slot = free_list.pop()
-
-        ticket = Ticket(
-            id=str(uuid.uuid4()),
-            vehicle=vehicle,
-            parking_slot=parking_slot,
-            entry_time_ms=int(time.time() * 1000),
-        )
-
-        self.occupied_spot[vehicle.id] = ticket
+        with self._vehicle_lock(vehicle.id):
+            # Avoid multiple entries for same vehicle
+            if vehicle.id in self.occupied_spot:
+                raise ParkingLotError("Vehicle already exists in the Parking Lot")
+
+            parking_slot = self._take_spot(vehicle.type)
+
+            if self.compact_tickets:
+                ticket = CompactTicket(
+                    next(self._ticket_numbers), vehicle, self.spot_ordinal[parking_slot], int(time.time() * 1000)
+                )
+            else:
+                ticket = Ticket(
+                    id=str(uuid.uuid4()),
+                    vehicle=vehicle,
+                    parking_slot=parking_slot,
+                    entry_time_ms=int(time.time() * 1000),
+                )
+
+            # Still under the vehicle lock, so a checkpoint never sees the ticket without its journal record
+            if self._journal is not None:
+                self._journal.record_entry(ticket, parking_slot)
+            self.occupied_spot[vehicle.id] = ticket
+
+        self._commit_journal()
+        self._maybe_checkpoint()
         return ticket
 
-    def exit_lot(self, ticket: Ticket) -> int:
+    def exit_lot(self, ticket: AnyTicket) -> int:
         if ticket is None:
             raise ParkingLotError("Ticket cannot be None")
 
         vehicle_id = ticket.vehicle.id
 
-        existing = self.occupied_spot.get(vehicle_id)
-        if existing is None:
-            raise ParkingLotError("Vehicle does not exist in the parking lot")
+        with self._vehicle_lock(vehicle_id):
+            existing = self.occupied_spot.get(vehicle_id)
+            if existing is None:
+                raise ParkingLotError("Vehicle does not exist in the parking lot")
 
-        # (Optional) ensure ticket matches the active one (prevents using old ticket)
-        if existing.id != ticket.id:
-            raise ParkingLotError("Ticket is not active / does not match current vehicle entry")
+            # (Optional) ensure ticket matches the active one (prevents using old ticket)
+            if existing is not ticket and self._ticket_key(existing) != self._ticket_key(ticket):
+                raise ParkingLotError("Ticket is not active / does not match current vehicle entry")
 
-        slot = ticket.parking_slot
-        slot_type = self.spot_type_by_slot.get(slot)
-        if slot_type is None:
-            raise ParkingLotError("Invalid parking slot on ticket")
+            slot = self.slot_of(ticket)
+            slot_type = self.spot_type_by_slot.get(slot)
+            if slot_type is None:
+                raise ParkingLotError("Invalid parking slot on ticket")
 
-        # Release slot back to correct free list
-        self._get_free_list(slot_type).append(slot)
+            # Release slot back to correct free list (unless it is being drained)
+            with self._type_locks[slot_type]:
+                if slot in self._out_of_service:
+                    self._occupied[self.spot_ordinal[slot]] = 0
+                else:
+                    self._get_free_list(slot_type).append(slot)
+                    self._mark_slot(slot, occupied=False)
+
+            # Remove occupancy
+            if self._journal is not None:
+                self._journal.record_exit(vehicle_id)
+            del self.occupied_spot[vehicle_id]
+
+        # Read before any checkpoint, so the snapshot write is not billed as parking time
+        exit_time_ms = int(time.time() * 1000)
+        self._commit_journal()
+        self._maybe_checkpoint()
 
-        # Remove occupancy
-        del self.occupied_spot[vehicle_id]
+        if self.history is not None:
+            self.history.append(ticket.vehicle.type, slot[0], ticket.entry_time_ms, exit_time_ms)
 
         # Fee (optional)
-        if self.hourly_rate_cents <= 0:
+        if self.tariff.free:
             return 0
 
-        exit_time_ms = int(time.time() * 1000)
         return self._compute_fee(ticket.entry_time_ms, exit_time_ms)
 
     def display_availability(self, vehicle_type: VehicleType) -> int:
         """Return number of free spots for that type."""
         return len(self._get_free_list(vehicle_type))
 
-    def _get_free_list(self, vehicle_type: VehicleType) -> List[Tuple[str, str]]:
+    def display_level_availability(self, level_id: str, vehicle_type: VehicleType) -> int:
+        """Free spots of that type on one level (O(1), for the entrance signs)."""
+        counts = self._free_by_level.get(level_id)
+        if counts is None:
+            raise ParkingLotError(f"Unknown level: {level_id}")
+        return counts[vehicle_type]
+
+    def level_availability(self, level_id: str) -> Dict[VehicleType, int]:
+        """Free spots per type on one level."""
+        counts = self._free_by_level.get(level_id)
+        if counts is None:
+            raise ParkingLotError(f"Unknown level: {level_id}")
+        return dict(counts)
+
+    def occupancy_array(self, level_id: Optional[str] = None):
+        """
+        Copy of the occupancy bitmap (whole lot, or one level), position i = spot ordinal (see slot_by_ordinal).
+        A NumPy bool array when NumPy is installed (one buffer copy, no per-spot Python work), else bytes of 0/1.
+        For one level: its level_range block, then any spots added to it later. Closed spots read as 0.
+        Takes no lock: the copy is made before NumPy sees it, since a view into the live bytearray would stop
+        add_spot / add_level from growing it (BufferError).
+        """
+        if level_id is not None:
+            self._check_level(level_id)
+        start, end = (0, len(self._occupied)) if level_id is None else self.level_range[level_id]
+        extra = [] if level_id is None else self._extra_ordinals[level_id]
+        # Slicing a bytearray copies it
+        bitmap = self._occupied[start:end]
+        if extra:
+            bitmap += bytes(self._occupied[i] for i in extra)
+        if np is not None:
+            return np.frombuffer(bitmap, dtype=np.bool_)
+        return bytes(bitmap)
+
+    def close(self) -> None:
+        """Shutdown: write out buffered history rows and close the journal (both may otherwise lose the tail)."""
+        if self.history is not None:
+            self.history.close()
+        if self._journal is not None:
+            self._journal.close()
+
+    def checkpoint(self) -> None:
+        """
+        Write a snapshot of every active ticket to the journal and start a fresh journal segment.
+        Briefly stops all gates (takes every vehicle and type lock) so the snapshot is consistent.
+        """
+        if self._journal is None:
+            raise ValueError("ParkingLot has no journal to checkpoint")
+
+        with self._all_locks():
+            self._journal.write_snapshot([(t, self.slot_of(t)) for t in self.occupied_spot.values()])
+
+    # Runtime reconfiguration: each call briefly stops all gates (like checkpoint) and only touches
+    # the spots it changes, never the whole lot.
+
+    def add_level(self, level: Level, spot_priority: Optional[Dict[Tuple[str, str], float]] = None) -> None:
+        """Open a new level; its spots go straight into the free pools. With spot_priority, give each new spot's."""
+        with self._all_locks():
+            self._add_priorities([(level.id, spot.id) for spot in level.parkingspots], spot_priority)
+            self._open_level(level)
+            self.levels.append(level)
+            self._sync_history(level.id)
+
+    def add_spot(self, level_id: str, spot: ParkingSpot, priority: Optional[float] = None) -> None:
+        """Add one spot to an existing level (free, in service)."""
+        with self._all_locks():
+            self._check_level(level_id)
+            slot = (level_id, spot.id)
+            if slot in self.spot_type_by_slot:
+                raise ValueError(f"Duplicate spot found: {slot}")
+            if not isinstance(spot.type, VehicleType):
+                raise ValueError(f"Unknown spot type: {spot.type}")
+            self._add_priorities([slot], None if priority is None else {slot: priority})
+
+            ordinal = len(self.slot_by_ordinal)
+            self._add_spot(level_id, spot)
+            # Only once the bitmap covers it, so a lock-free occupancy_array never indexes past the end
+            self._extra_ordinals[level_id].append(ordinal)
+            self._set_level_spots(level_id, self._level(level_id).parkingspots + [spot])
+            self._sync_history(level_id)
+
+    def drain_spot(self, level_id: str, spot_id: str) -> None:
+        """Stop handing this spot out. A parked vehicle leaves normally; the spot then stays empty."""
+        with self._all_locks():
+            self._take_out_of_service(self._known_slot(level_id, spot_id))
+
+    def drain_level(self, level_id: str) -> None:
+        """drain_spot for every spot on the level (e.g. before maintenance)."""
+        with self._all_locks():
+            for slot in self._level_slots(level_id):
+                self._take_out_of_service(slot)
+
+    def reopen_spot(self, level_id: str, spot_id: str) -> None:
+        """Undo drain_spot: the spot is handed out again (right away if it is empty)."""
+        with self._all_locks():
+            self._put_back_in_service(self._known_slot(level_id, spot_id))
+
+    def reopen_level(self, level_id: str) -> None:
+        with self._all_locks():
+            for slot in self._level_slots(level_id):
+                self._put_back_in_service(slot)
+
+    def close_spot(self, level_id: str, spot_id: str) -> None:
+        """Remove an empty spot from the lot (drain it first if a vehicle is parked there)."""
+        with self._all_locks():
+            slot = self._known_slot(level_id, spot_id)
+            if self._occupied[self.spot_ordinal[slot]]:
+                raise ParkingLotError(f"Spot {slot} is occupied; drain it and wait for the vehicle to leave")
+            self._remove_spot(slot)
+            spots = [spot for spot in self._level(level_id).parkingspots if spot.id != spot_id]
+            self._set_level_spots(level_id, spots)
+            self._sync_history(level_id)
+
+    def close_level(self, level_id: str) -> None:
+        """Remove a level with no parked vehicles (drain_level first and wait for it to empty)."""
+        with self._all_locks():
+            slots = self._level_slots(level_id)
+            if any(self._occupied[self.spot_ordinal[slot]] for slot in slots):
+                raise ParkingLotError(f"Level {level_id} still has parked vehicles; drain it first")
+            for slot in slots:
+                self._remove_spot(slot)
+
+            del self.level_range[level_id]
+            del self._free_by_level[level_id]
+            del self._extra_ordinals[level_id]
+            del self._spots_per_level[level_id]
+            self.levels = [level for level in self.levels if level.id != level_id]
+            # history keeps the level's last spot count, so turnover over its past stays meaningful
+
+    def restripe_spot(self, level_id: str, spot_id: str, vehicle_type: VehicleType) -> None:
+        """Change an empty spot's type in place (same ordinal); it moves to the other type's pool."""
+        with self._all_locks():
+            slot = self._known_slot(level_id, spot_id)
+            if self._occupied[self.spot_ordinal[slot]]:
+                raise ParkingLotError(f"Spot {slot} is occupied; drain it and wait for the vehicle to leave")
+
+            old_type = self.spot_type_by_slot[slot]
+            in_service = slot not in self._out_of_service
+            if in_service:
+                self._get_free_list(old_type).remove(slot)
+                self._free_by_level[level_id][old_type] -= 1
+            self.spot_type_by_slot[slot] = vehicle_type
+            if in_service:
+                self._get_free_list(vehicle_type).append(slot)
+                self._free_by_level[level_id][vehicle_type] += 1
+            spots = [
+                ParkingSpot(spot.id, vehicle_type) if spot.id == spot_id else spot
+                for spot in self._level(level_id).parkingspots
+            ]
+            self._set_level_spots(level_id, spots)
+
+    def spot_in_service(self, level_id: str, spot_id: str) -> bool:
+        return self._known_slot(level_id, spot_id) not in self._out_of_service
+
+    def slot_of(self, ticket: AnyTicket) -> Tuple[str, str]:
+        """(level_id, spot_id) of either ticket kind."""
+        if isinstance(ticket, CompactTicket):
+            if not 0 <= ticket.spot < len(self.slot_by_ordinal):
+                raise ParkingLotError("Invalid parking slot on ticket")
+            return self.slot_by_ordinal[ticket.spot]
+        return ticket.parking_slot
+
+    @staticmethod
+    def _ticket_key(ticket: AnyTicket):
+        return ticket.number if isinstance(ticket, CompactTicket) else ticket.id
+
+    def _take_spot(self, vehicle_type: VehicleType) -> Tuple[str, str]:
+        for spot_type in self._spot_types_to_try[vehicle_type]:
+            with self._type_locks[spot_type]:
+                free_list = self._get_free_list(spot_type)
+                if not free_list:
+                    continue
+
+                parking_slot = free_list.pop()
+                self._mark_slot(parking_slot, occupied=True)
+                if spot_type != vehicle_type:
+                    self.fallback_counts[(vehicle_type, spot_type)] += 1
+                return parking_slot
+
+        raise ParkingLotError(f"No available parking slots for {vehicle_type.value}")
+
+    @contextmanager
+    def _all_locks(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            for lock in self._vehicle_locks:
+                stack.enter_context(lock)
+            for lock in self._type_locks.values():
+                stack.enter_context(lock)
+            yield
+
+    def _check_level(self, level_id: str) -> None:
+        if level_id not in self.level_range:
+            raise ParkingLotError(f"Unknown level: {level_id}")
+
+    def _known_slot(self, level_id: str, spot_id: str) -> Tuple[str, str]:
+        self._check_level(level_id)
+        slot = (level_id, spot_id)
+        if slot not in self.spot_type_by_slot:
+            raise ParkingLotError(f"Unknown spot: {slot}")
+        return slot
+
+    def _level(self, level_id: str) -> Level:
+        return next(level for level in self.levels if level.id == level_id)
+
+    def _set_level_spots(self, level_id: str, spots: List[ParkingSpot]) -> None:
+        # Levels are frozen and may be shared with the caller (or another lot): swap in a new one, never mutate
+        self.levels = [Level(level_id, spots) if level.id == level_id else level for level in self.levels]
+
+    def _level_slots(self, level_id: str) -> List[Tuple[str, str]]:
+        """Current spots of one level: its block + later additions, skipping closed ones. O(spots on the level)."""
+        self._check_level(level_id)
+        first, end = self.level_range[level_id]
+        slots = []
+        for ordinal in itertools.chain(range(first, end), self._extra_ordinals[level_id]):
+            slot = self.slot_by_ordinal[ordinal]
+            # Closed spots keep their ordinal as a tombstone; a spot re-added under the same id gets a new one
+            if self.spot_ordinal.get(slot) == ordinal:
+                slots.append(slot)
+        return slots
+
+    def _add_priorities(
+        self, slots: List[Tuple[str, str]], priorities: Optional[Dict[Tuple[str, str], float]]
+    ) -> None:
+        if self.spot_priority is None:
+            return
+        priorities = priorities or {}
+        for slot in slots:
+            if slot not in priorities and slot not in self.spot_priority:
+                raise ValueError(f"No priority configured for spot {slot}")
+        # Shared with the NearestSpotPools
+        self.spot_priority.update(priorities)
+
+    def _take_out_of_service(self, slot: Tuple[str, str]) -> None:
+        if slot in self._out_of_service:
+            return
+        self._out_of_service.add(slot)
+        if not self._occupied[self.spot_ordinal[slot]]:
+            spot_type = self.spot_type_by_slot[slot]
+            self._get_free_list(spot_type).remove(slot)
+            self._free_by_level[slot[0]][spot_type] -= 1
+
+    def _put_back_in_service(self, slot: Tuple[str, str]) -> None:
+        if slot not in self._out_of_service:
+            return
+        self._out_of_service.discard(slot)
+        if not self._occupied[self.spot_ordinal[slot]]:
+            spot_type = self.spot_type_by_slot[slot]
+            self._get_free_list(spot_type).append(slot)
+            self._free_by_level[slot[0]][spot_type] += 1
+
+    def _remove_spot(self, slot: Tuple[str, str]) -> None:
+        """Forget an empty spot; its ordinal stays behind as a tombstone (reads as free in the bitmap)."""
+        self._take_out_of_service(slot)
+        self._out_of_service.discard(slot)
+        del self.spot_type_by_slot[slot]
+        del self.spot_ordinal[slot]
+        self._spots_per_level[slot[0]] -= 1
+
+    def _sync_history(self, level_id: str) -> None:
+        # Spot count per level is what history uses for turnover
+        if self.history is not None:
+            self.history.add_level(level_id, self._spots_per_level[level_id])
+
+    def _vehicle_lock(self, vehicle_id: str) -> ContextManager:
+        return self._vehicle_locks[hash(vehicle_id) % len(self._vehicle_locks)]
+
+    def _mark_slot(self, slot: Tuple[str, str], occupied: bool) -> None:
+        self._occupied[self.spot_ordinal[slot]] = occupied
+        self._free_by_level[slot[0]][self.spot_type_by_slot[slot]] += -1 if occupied else 1
+
+    def _commit_journal(self) -> None:
+        """Wait until this thread's journal records are on disk (call with no lot locks held)."""
+        if self._journal is not None:
+            self._journal.commit()
+
+    def _maybe_checkpoint(self) -> None:
+        if self._journal is not None and self._journal.checkpoint_due():
+            self.checkpoint()
+
+    def _restore_tickets(self, records: List[TicketRecord]) -> None:
+        """
+        Load tickets recovered from a snapshot/journal into a fresh lot (nothing journaled).
+        O(spots + tickets): marks their spots occupied, then rebuilds the free pools from the spots left.
+        """
+        last_number = 0
+        for vehicle_id, vehicle_type, ticket_id, slot, entry_time_ms in records:
+            if slot not in self.spot_type_by_slot:
+                raise ValueError(f"Journal references unknown spot: {slot}")
+            vehicle = Vehicle(vehicle_id, VehicleType(vehicle_type))
+            if self.compact_tickets:
+                number = decode_ticket_id(ticket_id)
+                last_number = max(last_number, number)
+                ticket: AnyTicket = CompactTicket(number, vehicle, self.spot_ordinal[slot], entry_time_ms)
+            else:
+                ticket = Ticket(id=ticket_id, vehicle=vehicle, parking_slot=slot, entry_time_ms=entry_time_ms)
+            self.occupied_spot[vehicle_id] = ticket
+            self._mark_slot(slot, occupied=True)
+
+        # New compact tickets continue after the recovered ones
+        self._ticket_numbers = itertools.count(last_number + 1)
+
+        self.empty_motorcycle_spots = self._new_pool()
+        self.empty_car_spots = self._new_pool()
+        self.empty_truck_spots = self._new_pool()
+        for ordinal, slot in enumerate(self.slot_by_ordinal):
+            if not self._occupied[ordinal]:
+                self._get_free_list(self.spot_type_by_slot[slot]).append(slot)
+
+    def _new_pool(self) -> SpotPool:
+        if self.spot_priority is None:
+            return LifoSpotPool()
+        return NearestSpotPool(self.spot_priority)
+
+    def _get_free_list(self, vehicle_type: VehicleType) -> SpotPool:
         if vehicle_type == VehicleType.MOTORCYCLE:
             return self.empty_motorcycle_spots
         if vehicle_type == VehicleType.CAR:
@@ -173,13 +788,5 @@ class ParkingLot:
         if exit_time_ms < entry_time_ms:
             raise ParkingLotError("Exit time cannot be earlier than entry time")
 
-        duration_ms = exit_time_ms - entry_time_ms
-        hour_ms = 1000 * 60 * 60
-
-        hours = duration_ms // hour_ms
-        if duration_ms % hour_ms != 0:
-            hours += 1  # round up partial hour
-        if hours == 0:
-            hours = 1  # minimum 1 hour
-
-        return hours * self.hourly_rate_cents
+        # Billed in whole units from entry (rounded up, minimum one); O(log segments) whatever the stay length
+        return self.tariff.fee(entry_time_ms, exit_time_ms)
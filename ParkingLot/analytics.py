@@ -0,0 +1,256 @@
+"""
+Revenue / dwell-time / turnover reports over closed-ticket history.
+
+History is a directory of columns (one raw little-endian file per column + meta.json), appended by
+ClosedTicketLog (e.g. from ParkingLot(history=...)). analyze() memory-maps the columns and works through them
+`chunk_rows` at a time with NumPy, so memory stays bounded however many months are stored, and fees use the
+same Tariff (same rounding) as exit_lot.
+"""
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ParkingLot import Level, VehicleType
+from tariff import DAY_MS, HOUR_MS, MINUTE_MS, WEEK_MS, Tariff
+
+# column -> (array typecode for the writer, NumPy dtype for the reader)
+COLUMNS: Dict[str, Tuple[str, str]] = {
+    "entry_ms": ("q", "<i8"),
+    "exit_ms": ("q", "<i8"),
+    "level": ("i", "<i4"),
+    "vehicle_type": ("b", "<i1"),
+}
+VEHICLE_TYPES: List[VehicleType] = list(VehicleType)
+# Dwell histogram bucket edges in minutes (last bucket is open-ended)
+DEFAULT_DWELL_EDGES_MIN: Tuple[int, ...] = (0, 15, 30, 60, 120, 240, 480, 1440, 3 * 1440, 7 * 1440)
+
+
+class ClosedTicketLog:
+    """
+    Append-only columnar history of closed tickets. Rows are buffered and written `flush_every` at a time.
+    Levels are stored as an index into meta.json's level list (new levels are added as they show up).
+    Column files appear on the first flush; call close() at shutdown so the last partial buffer is written.
+    """
+
+    META_FILE = "meta.json"
+
+    def __init__(self, directory: str, levels: List[Level], flush_every: int = 4096):
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1")
+        self.directory = directory
+        self.flush_every = flush_every
+        os.makedirs(directory, exist_ok=True)
+
+        # level_id -> spot count, in index order
+        self._levels: Dict[str, int] = {}
+        meta_path = os.path.join(directory, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self._levels = {level_id: spots for level_id, spots in json.load(f)["levels"]}
+        self._level_index: Dict[str, int] = {level_id: i for i, level_id in enumerate(self._levels)}
+        for level in levels:
+            self.add_level(level.id, len(level.parkingspots))
+
+        self._lock = Lock()
+        self._buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+        self._type_index = {t: i for i, t in enumerate(VEHICLE_TYPES)}
+
+    def add_level(self, level_id: str, spots: int) -> None:
+        """Register a level (or update its spot count, used for turnover)."""
+        if level_id not in self._level_index:
+            self._level_index[level_id] = len(self._level_index)
+        self._levels[level_id] = spots
+        self._write_meta()
+
+    def append(self, vehicle_type: VehicleType, level_id: str, entry_ms: int, exit_ms: int) -> None:
+        with self._lock:
+            b = self._buffers
+            b["entry_ms"].append(entry_ms)
+            b["exit_ms"].append(exit_ms)
+            b["level"].append(self._level_index[level_id])
+            b["vehicle_type"].append(self._type_index[vehicle_type])
+            if len(b["entry_ms"]) >= self.flush_every:
+                self._flush_locked()
+
+    def append_columns(self, entry_ms: np.ndarray, exit_ms: np.ndarray, level: np.ndarray, vehicle_type: np.ndarray) -> None:
+        """Bulk append (imports, backfills): level / vehicle_type are already indexes."""
+        with self._lock:
+            self._flush_locked()
+            for name, values in (("entry_ms", entry_ms), ("exit_ms", exit_ms), ("level", level), ("vehicle_type", vehicle_type)):
+                with open(self._column_path(name), "ab") as f:
+                    np.asarray(values, dtype=COLUMNS[name][1]).tofile(f)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _flush_locked(self) -> None:
+        if not self._buffers["entry_ms"]:
+            return
+        for name, buffer in self._buffers.items():
+            with open(self._column_path(name), "ab") as f:
+                # array is native-endian; the column files are little-endian
+                np.frombuffer(buffer, dtype=buffer.typecode).astype(COLUMNS[name][1]).tofile(f)
+            del buffer[:]
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.directory, self.META_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"levels": [[level_id, spots] for level_id, spots in self._levels.items()],
+                       "vehicle_types": [t.value for t in VEHICLE_TYPES]}, f)
+        os.replace(path + ".tmp", path)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.col")
+
+
+@dataclass
+class HistoryReport:
+    tickets: int
+    revenue_cents: int
+    daily_revenue_cents: Dict[str, int]          # local exit date (YYYY-MM-DD) -> cents
+    dwell_edges_min: Tuple[int, ...]
+    dwell_counts: List[int]                      # tickets per [edge_i, edge_i+1) minutes, last bucket open-ended
+    tickets_per_level: Dict[str, int]
+    turnover_per_level: Dict[str, float]         # closed tickets per spot per day over the covered exit days
+    revenue_per_type_cents: Dict[str, int]
+
+
+def iter_chunks(directory: str, chunk_rows: int = 1_000_000) -> Iterator[Dict[str, np.ndarray]]:
+    """Columns `chunk_rows` rows at a time (memory-mapped, only one chunk in memory)."""
+    columns = {}
+    for name, (_, dtype) in COLUMNS.items():
+        path = os.path.join(directory, f"{name}.col")
+        # Missing until the log's first flush: a new or small history is just empty
+        has_rows = os.path.exists(path) and os.path.getsize(path)
+        columns[name] = np.memmap(path, dtype=dtype, mode="r") if has_rows else np.empty(0, dtype)
+    rows = min(len(c) for c in columns.values())  # a crash mid-flush can leave one column a row ahead
+    for start in range(0, rows, chunk_rows):
+        yield {name: np.array(c[start:start + chunk_rows]) for name, c in columns.items()}
+
+
+def vectorized_fees(tariff: Tariff, entry_ms: np.ndarray, exit_ms: np.ndarray) -> np.ndarray:
+    """Tariff.fee for whole arrays, same billing units, free / grace minutes, daily cap and rounding."""
+    schedule = tariff.schedule
+    entry_ms = np.asarray(entry_ms, dtype=np.int64)
+    exit_ms = np.asarray(exit_ms, dtype=np.int64)
+    duration = exit_ms - entry_ms
+    if (duration < 0).any():
+        raise ValueError("Exit time cannot be earlier than entry time")
+
+    segment_starts, segment_rates, segment_cum, week_total = tariff.segments
+    starts = np.asarray(segment_starts, dtype=np.int64)
+    rates = np.asarray(segment_rates, dtype=np.int64)
+    cum = np.asarray(segment_cum, dtype=np.int64)
+    offset_ms = schedule.utc_offset_minutes * MINUTE_MS + 3 * DAY_MS  # same Monday-based week as Tariff
+
+    def cumulative(t: np.ndarray) -> np.ndarray:
+        weeks, offset = np.divmod(t + offset_ms, WEEK_MS)
+        i = np.searchsorted(starts, offset, side="right") - 1
+        return weeks * week_total + cum[i] + rates[i] * (offset - starts[i])
+
+    def cents(rate_ms: np.ndarray) -> np.ndarray:
+        return -(-rate_ms // HOUR_MS)
+
+    # Billing starts after the free minutes (see Tariff.billed_interval); rows with nothing billed are zeroed below
+    free_ms = schedule.free_minutes * MINUTE_MS
+    start_ms = entry_ms + free_ms
+    unit_ms = schedule.billing_unit_minutes * MINUTE_MS
+    units = np.maximum(schedule.minimum_units, -(-(exit_ms - start_ms) // unit_ms))
+    end = start_ms + units * unit_ms
+
+    cap = schedule.daily_cap_cents
+    if cap is None:
+        fees = cents(cumulative(end) - cumulative(start_ms))
+    else:
+        full_days, rest = np.divmod(end - start_ms, DAY_MS)
+        last = start_ms + full_days * DAY_MS
+        fees = np.where(rest > 0, np.minimum(cap, cents(cumulative(end) - cumulative(last))), 0)
+
+        # Only stays of a day or more have full windows; price those rows separately
+        long_stay = np.nonzero(full_days)[0]
+        if len(long_stay):
+            start = start_ms[long_stay]
+            weeks, extra = np.divmod(full_days[long_stay], 7)
+            bounds = [cumulative(start + k * DAY_MS) for k in range(8)]
+            for k in range(7):
+                # Window k recurs every 7 days: counted `weeks` times, plus once more if k < extra
+                window = np.minimum(cap, cents(bounds[k + 1] - bounds[k]))
+                fees[long_stay] += window * (weeks + (k < extra))
+
+    if free_ms > 0:
+        fees[duration <= free_ms] = 0
+    if schedule.grace_minutes > 0:
+        fees[duration <= schedule.grace_minutes * MINUTE_MS] = 0
+    return fees
+
+
+def analyze(
+    directory: str,
+    tariff: Tariff,
+    chunk_rows: int = 1_000_000,
+    dwell_edges_min: Tuple[int, ...] = DEFAULT_DWELL_EDGES_MIN,
+) -> HistoryReport:
+    with open(os.path.join(directory, ClosedTicketLog.META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    level_ids = [level_id for level_id, _ in meta["levels"]]
+    level_spots = np.array([spots for _, spots in meta["levels"]], dtype=np.float64)
+
+    local_offset_ms = tariff.schedule.utc_offset_minutes * MINUTE_MS
+    edges_ms = np.asarray(dwell_edges_min, dtype=np.int64) * MINUTE_MS
+
+    tickets = 0
+    revenue = 0
+    daily: Dict[int, int] = {}  # local day number since epoch -> cents
+    # Exit days covered, tracked apart from `daily` so free / zero-revenue days still count for turnover
+    first_day: Optional[int] = None
+    last_day: Optional[int] = None
+    dwell_counts = np.zeros(len(dwell_edges_min), dtype=np.int64)
+    per_level = np.zeros(len(level_ids), dtype=np.int64)
+    per_type = np.zeros(len(VEHICLE_TYPES), dtype=np.int64)
+
+    for chunk in iter_chunks(directory, chunk_rows):
+        entry, exit_ = chunk["entry_ms"], chunk["exit_ms"]
+        fees = vectorized_fees(tariff, entry, exit_)
+        tickets += len(fees)
+        revenue += int(fees.sum())
+
+        days = (exit_ + local_offset_ms) // DAY_MS
+        first = int(days.min())
+        first_day = first if first_day is None else min(first_day, first)
+        last_day = int(days.max()) if last_day is None else max(last_day, int(days.max()))
+        for i, cents in enumerate(np.bincount(days - first, weights=fees).astype(np.int64)):
+            if cents:
+                daily[first + i] = daily.get(first + i, 0) + int(cents)
+
+        bucket = np.searchsorted(edges_ms, exit_ - entry, side="right") - 1
+        dwell_counts += np.bincount(bucket, minlength=len(dwell_counts))
+        per_level += np.bincount(chunk["level"], minlength=len(per_level))[:len(per_level)]
+        per_type += np.bincount(chunk["vehicle_type"], weights=fees, minlength=len(per_type)).astype(np.int64)
+
+    covered_days = (last_day - first_day + 1) if first_day is not None else 1
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return HistoryReport(
+        tickets=tickets,
+        revenue_cents=revenue,
+        daily_revenue_cents={(epoch + timedelta(days=d)).date().isoformat(): c for d, c in sorted(daily.items())},
+        dwell_edges_min=tuple(dwell_edges_min),
+        dwell_counts=dwell_counts.tolist(),
+        tickets_per_level=dict(zip(level_ids, per_level.tolist())),
+        turnover_per_level={
+            level_id: (count / spots / covered_days if spots else 0.0)
+            for level_id, count, spots in zip(level_ids, per_level.tolist(), level_spots.tolist())
+        },
+        revenue_per_type_cents={t.value: int(c) for t, c in zip(VEHICLE_TYPES, per_type)},
+    )
@@ -0,0 +1,227 @@
+"""
+Small benchmarks for the parking lot backend.
+
+Run:
+    python benchmark.py
+"""
+from __future__ import annotations
+
+import gc
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import List
+
+from journal import ParkingLotJournal
+from ParkingLot import Level, ParkingLot, ParkingLotError, ParkingSpot, Vehicle, VehicleType
+from tariff import HOUR_MS, WEEKEND, RateRule, Tariff, TariffSchedule
+
+
+def build_levels(levels: int, spots_per_type: int) -> List[Level]:
+    """`levels` levels, each with `spots_per_type` spots of every VehicleType."""
+    return [
+        Level(
+            id=f"L{l}",
+            parkingspots=[
+                ParkingSpot(f"{t.value[0].upper()}{i}", t) for t in VehicleType for i in range(spots_per_type)
+            ],
+        )
+        for l in range(levels)
+    ]
+
+
+def bench_multi_gate(spots_per_type: int = 2_000, ops_per_gate: int = 20_000) -> None:
+    """
+    1..16 gate threads, each running entry + exit cycles for its own vehicles (types mixed across gates).
+    Checks afterwards that no spot was handed out twice and every count is back to full.
+    On a GIL build throughput stays roughly flat (the locks only buy correctness); the striping is what lets
+    gates of different types/vehicles proceed in parallel on a free-threaded build.
+    """
+    print(f"\nmulti-gate entry+exit, {ops_per_gate} cycles per gate")
+    types = list(VehicleType)
+
+    for gates in (1, 2, 4, 8, 16):
+        lot = ParkingLot(build_levels(4, spots_per_type // 4), thread_safe=True)
+        total_free = {t: lot.display_availability(t) for t in types}
+        errors: List[Exception] = []
+
+        def gate(g: int) -> None:
+            vehicle_type = types[g % len(types)]
+            try:
+                for i in range(ops_per_gate):
+                    # Same ids across gates on purpose: duplicates must be rejected, never admitted twice
+                    vehicle = Vehicle(f"V{g % 4}-{i % 64}", vehicle_type)
+                    try:
+                        ticket = lot.entry_into_lot(vehicle)
+                    except ParkingLotError:
+                        continue
+                    lot.exit_lot(ticket)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=gate, args=(g,)) for g in range(gates)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        assert not errors, errors
+        assert not lot.occupied_spot
+        assert all(lot.display_availability(t) == total_free[t] for t in types)
+        assert not any(lot.occupancy_array())
+        cycles = gates * ops_per_gate
+        print(f" - {gates:>2} gates -> {cycles / elapsed:10,.0f} cycles/s")
+
+
+def bench_compact_tickets(n: int = 1_000_000) -> None:
+    """
+    n vehicles parked at once (n CAR spots), uuid4 + dataclass tickets vs compact tickets.
+    Memory is what entering all n adds (tickets + occupied_spot); vehicles and the lot are built beforehand.
+    """
+    print(f"\ncompact tickets, {n} concurrent tickets")
+    levels = [Level("L0", [ParkingSpot(f"C{i}", VehicleType.CAR) for i in range(n)])]
+    vehicles = [Vehicle(f"V{i}", VehicleType.CAR) for i in range(n)]
+
+    for label, compact in (("uuid4", False), ("compact", True)):
+        # Latency run without tracemalloc (it slows allocation down)
+        lot = ParkingLot(levels, compact_tickets=compact)
+        gc.collect()
+        start = time.perf_counter()
+        for v in vehicles:
+            lot.entry_into_lot(v)
+        entry = (time.perf_counter() - start) / n
+
+        start = time.perf_counter()
+        for ticket in list(lot.occupied_spot.values()):
+            lot.exit_lot(ticket)
+        exit_ = (time.perf_counter() - start) / n
+        del lot
+
+        lot = ParkingLot(levels, compact_tickets=compact)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for v in vehicles:
+            lot.entry_into_lot(v)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del lot
+
+        print(f" - {label:<8} entry {entry * 1e6:5.2f} us | exit {exit_ * 1e6:5.2f} us | "
+              f"{used / 2**20:7.1f} MiB ({used / n:5.1f} B/ticket)")
+
+
+def bench_journal_recovery(events: int = 1_000_000, spots: int = 100_000) -> None:
+    """
+    Gate latency with/without the journal, then restart from `events` journaled entries/exits
+    (journal tail only, no snapshot in between) and from a snapshot.
+    """
+    print(f"\njournal, {events} events, {spots} spots")
+    levels = [Level("L0", [ParkingSpot(f"C{i}", VehicleType.CAR) for i in range(spots)])]
+    vehicles = [Vehicle(f"V{i}", VehicleType.CAR) for i in range(spots)]
+
+    def run(lot: ParkingLot) -> float:
+        # Fill to half, then alternate exit of the oldest / entry of the next vehicle
+        start = time.perf_counter()
+        tickets = [lot.entry_into_lot(v) for v in vehicles[: spots // 2]]
+        done, nxt = spots // 2, spots // 2
+        while done < events:
+            lot.exit_lot(tickets[(nxt - spots // 2) % len(tickets)])
+            tickets[(nxt - spots // 2) % len(tickets)] = lot.entry_into_lot(vehicles[nxt % spots])
+            nxt += 1
+            done += 2
+        return (time.perf_counter() - start) / done
+
+    plain = run(ParkingLot(levels))
+    with tempfile.TemporaryDirectory() as directory:
+        # Single-threaded, durable=True would be one fsync per event: measure the batched path
+        journal = ParkingLotJournal(directory, checkpoint_every=events * 2, durable=False)
+        journaled = run(ParkingLot(levels, journal=journal))
+        journal.close()
+        print(f" - gate op: {plain * 1e6:.2f} us plain, {journaled * 1e6:.2f} us journaled")
+
+        start = time.perf_counter()
+        journal = ParkingLotJournal(directory)
+        lot = ParkingLot(levels, journal=journal)
+        print(f" - recovery from journal tail: {time.perf_counter() - start:.2f} s ({len(lot.occupied_spot)} parked)")
+
+        lot.checkpoint()
+        journal.close()
+        start = time.perf_counter()
+        journal = ParkingLotJournal(directory)
+        lot = ParkingLot(levels, journal=journal)
+        print(f" - recovery from snapshot:     {time.perf_counter() - start:.2f} s")
+        journal.close()
+
+
+def bench_tariff(runs: int = 20_000) -> None:
+    """Fee lookup for short and very long stays: weekday peak + weekend rate + 15 min free + daily cap."""
+    print("\ntariff fee lookup")
+    tariff = Tariff(TariffSchedule(
+        base_cents_per_hour=300,
+        rules=(RateRule(600, days=frozenset(range(5)), start_minute=7 * 60, end_minute=10 * 60), RateRule(150, WEEKEND)),
+        free_minutes=15,
+        daily_cap_cents=3_000,
+    ))
+    entry = 1_700_000_000_000
+    for label, hours in (("2 hours", 2), ("3 days", 72), ("90 days", 90 * 24)):
+        exit_ = entry + hours * HOUR_MS + 1
+        start = time.perf_counter()
+        for _ in range(runs):
+            fee = tariff.fee(entry, exit_)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f" - {label:<8} {elapsed * 1e6:6.2f} us/fee (fee {fee} cents)")
+
+
+def bench_history_analytics(rows: int = 10_000_000, sample: int = 100_000) -> None:
+    """
+    Revenue / dwell / turnover report over `rows` closed tickets (about a year of a busy lot), streamed in chunks,
+    vs pricing a sample one ticket at a time with Tariff.fee. Peak memory is the streaming pass only.
+    """
+    import numpy as np
+
+    from analytics import ClosedTicketLog, analyze
+
+    print(f"\nhistory analytics, {rows} closed tickets")
+    tariff = Tariff(TariffSchedule(
+        base_cents_per_hour=300,
+        rules=(RateRule(600, days=frozenset(range(5)), start_minute=7 * 60, end_minute=10 * 60),),
+        free_minutes=15,
+        daily_cap_cents=3_000,
+    ))
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as directory:
+        log = ClosedTicketLog(directory, build_levels(4, 250))
+        for start in range(0, rows, 1_000_000):
+            n = min(1_000_000, rows - start)
+            entry = 1_700_000_000_000 + rng.integers(0, 365 * 24 * HOUR_MS, n)
+            exit_ = entry + rng.exponential(3 * HOUR_MS, n).astype(np.int64)
+            log.append_columns(entry, exit_, rng.integers(0, 4, n), rng.integers(0, 3, n))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        report = analyze(directory, tariff)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        entry, exit_ = entry[:sample].tolist(), exit_[:sample].tolist()
+        start = time.perf_counter()
+        for e, x in zip(entry, exit_):
+            tariff.fee(e, x)
+        per_ticket = (time.perf_counter() - start) / sample
+
+    print(f" - streamed + vectorized: {elapsed:.2f} s, peak {peak / 2**20:.0f} MiB, "
+          f"revenue {report.revenue_cents / 100:,.0f}, {len(report.daily_revenue_cents)} days")
+    print(f" - one ticket at a time:  {per_ticket * rows:.2f} s (extrapolated from {sample})")
+
+
+if __name__ == "__main__":
+    bench_multi_gate()
+    bench_compact_tickets()
+    bench_journal_recovery()
+    bench_tariff()
+    bench_history_analytics()
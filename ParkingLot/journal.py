@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from threading import Condition, Lock, Timer, local
+from typing import Dict, List, Tuple
+
+from ParkingLot import AnyTicket
+
+# What recovery hands back per parked vehicle: (vehicle_id, vehicle type value, ticket id, (level_id, spot_id), entry_time_ms)
+TicketRecord = Tuple[str, str, str, Tuple[str, str], int]
+
+
+class ParkingLotJournal:
+    """
+    Append-only entry/exit log + snapshots for ParkingLot, so parked vehicles and their tickets survive a restart.
+
+    Files in `directory`:
+    - snapshot.json      -> every active ticket at the last checkpoint + which journal segment follows it
+    - journal-<gen>.log  -> one tab-separated line per entry / exit since that snapshot (ids escaped, see _quote)
+
+    The free pools are not stored: they are exactly the spots no active ticket holds, so recovery rebuilds them.
+    Group commit (durable=True, the default): an entry / exit returns only once its record is on disk (commit()).
+    Callers committing at the same time share one write + fsync: the first becomes the leader and writes
+    everything buffered so far; the others wait for it, and whatever arrives meanwhile goes in the next write.
+    A lone caller pays one fsync; under load each fsync covers many records.
+
+    durable=False trades that for speed: records are written `group_commit_size` at a time, and at most
+    `max_delay_s` after the first of a batch, so a crash can lose that much (call flush() before shutdown).
+
+    Usage:
+        journal = ParkingLotJournal("parking_state")
+        lot = ParkingLot(levels, journal=journal)   # loads snapshot + replays the journal tail
+    """
+
+    SNAPSHOT_FILE = "snapshot.json"
+
+    def __init__(
+        self,
+        directory: str,
+        group_commit_size: int = 64,
+        checkpoint_every: int = 100_000,
+        fsync: bool = True,
+        durable: bool = True,
+        max_delay_s: float = 0.05,
+    ):
+        if group_commit_size < 1:
+            raise ValueError("group_commit_size must be at least 1")
+        if max_delay_s <= 0:
+            raise ValueError("max_delay_s must be positive")
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1")
+
+        self.directory = directory
+        self.group_commit_size = group_commit_size
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.durable = durable
+        self.max_delay_s = max_delay_s
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        self._buffer: List[str] = []
+        self._records_since_checkpoint = 0
+        # Group commit state (all under _lock): records appended / on disk so far, and whether a leader is writing
+        self._written = Condition(self._lock)
+        self._appended = 0
+        self._durable_upto = 0
+        self._writing = False
+        self._last_appended = local()  # per thread: number of its last record, what commit() waits for
+        self._delay_timer: Timer | None = None
+
+        # Snapshot is parsed once here and handed to load(); vehicle_id -> record
+        self._generation, self._snapshot_tickets = self._read_snapshot()
+        # A crash mid-write leaves a partial last line; cut it before appending, or the next record joins it
+        _truncate_torn_tail(self._journal_path(self._generation))
+        self._file = open(self._journal_path(self._generation), "a", encoding="utf-8")
+
+    # Called by ParkingLot
+    def record_entry(self, ticket: AnyTicket, slot: Tuple[str, str]) -> None:
+        vehicle = ticket.vehicle
+        fields = [vehicle.id, vehicle.type.value, ticket.id, slot[0], slot[1]]
+        self._append("N\t" + "\t".join(map(_quote, fields)) + f"\t{ticket.entry_time_ms}\n")
+
+    def record_exit(self, vehicle_id: str) -> None:
+        self._append(f"X\t{_quote(vehicle_id)}\n")
+
+    def checkpoint_due(self) -> bool:
+        return self._records_since_checkpoint >= self.checkpoint_every
+
+    def write_snapshot(self, tickets: List[Tuple[AnyTicket, Tuple[str, str]]]) -> None:
+        """Caller must make sure no entry/exit is in flight (ParkingLot.checkpoint holds all its locks)."""
+        with self._lock:
+            self._drain_locked()
+            new_generation = self._generation + 1
+
+            snapshot = {
+                "journal_generation": new_generation,
+                "tickets": [
+                    [t.vehicle.id, t.vehicle.type.value, t.id, slot[0], slot[1], t.entry_time_ms] for t, slot in tickets
+                ],
+            }
+            path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            # Atomic switch: a crash before this line recovers from the old snapshot + old (complete) journal
+            os.replace(tmp_path, path)
+
+            self._file.close()
+            old_path = self._journal_path(self._generation)
+            self._generation = new_generation
+            self._file = open(self._journal_path(new_generation), "a", encoding="utf-8")
+            os.remove(old_path)
+            self._records_since_checkpoint = 0
+
+    def load(self) -> List[TicketRecord]:
+        """
+        Return the active tickets: latest snapshot with the journal tail replayed on top. O(snapshot + tail).
+        Meant to be called once, at startup (ParkingLot does this) and before anything new is recorded.
+        """
+        live, self._snapshot_tickets = self._snapshot_tickets, {}
+
+        with open(self._journal_path(self._generation), "r", encoding="utf-8") as f:
+            # Every line is complete: a torn tail was truncated when the journal was opened
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if "\\" in line:
+                    parts = [_unquote(part) for part in parts]
+                if parts[0] == "N":
+                    live[parts[1]] = (parts[1], parts[2], parts[3], (parts[4], parts[5]), int(parts[6]))
+                else:
+                    live.pop(parts[1], None)
+
+        return list(live.values())
+
+    def commit(self) -> None:
+        """
+        Wait until every record this thread appended is on disk (no-op with durable=False).
+        Called by ParkingLot after releasing its own locks, so nothing else waits on the fsync.
+        """
+        if not self.durable:
+            return
+        upto = getattr(self._last_appended, "seq", 0)
+        with self._lock:
+            while self._durable_upto < upto:
+                if self._writing:
+                    self._written.wait()
+                    continue
+                # Leader: take everything buffered so far (ours and the waiting followers') in one write + fsync
+                batch, self._buffer = self._buffer, []
+                batch_upto = self._appended
+                self._writing = True
+                self._lock.release()
+                written = False
+                try:
+                    self._write(batch)
+                    written = True
+                finally:
+                    self._lock.acquire()
+                    self._writing = False
+                    if written:
+                        self._durable_upto = batch_upto
+                    else:
+                        # Not on disk: put it back so no follower is told its record is durable
+                        self._buffer = batch + self._buffer
+                    self._written.notify_all()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._drain_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._drain_locked()
+            if self._delay_timer is not None:
+                self._delay_timer.cancel()
+            self._file.close()
+
+    def _append(self, line: str) -> None:
+        with self._lock:
+            self._buffer.append(line)
+            self._appended += 1
+            self._last_appended.seq = self._appended
+            self._records_since_checkpoint += 1
+            if self.durable:
+                return
+            if len(self._buffer) >= self.group_commit_size:
+                self._drain_locked()
+            elif len(self._buffer) == 1:
+                # First record of a batch: make sure it reaches disk within max_delay_s even if the bank goes quiet
+                self._delay_timer = Timer(self.max_delay_s, self._flush_if_open)
+                self._delay_timer.daemon = True
+                self._delay_timer.start()
+
+    def _flush_if_open(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._drain_locked()
+
+    def _drain_locked(self) -> None:
+        """Write out the buffer (after any leader's write in flight); caller holds _lock."""
+        while self._writing:
+            self._written.wait()
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+        self._durable_upto = self._appended
+
+    def _write(self, records: List[str]) -> None:
+        self._file.write("".join(records))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"journal-{generation}.log")
+
+    def _read_snapshot(self) -> Tuple[int, Dict[str, TicketRecord]]:
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0, {}
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        return snapshot["journal_generation"], {
+            vehicle_id: (vehicle_id, vehicle_type, ticket_id, (level_id, spot_id), entry_ms)
+            for vehicle_id, vehicle_type, ticket_id, level_id, spot_id, entry_ms in snapshot["tickets"]
+        }
+
+
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+_ESCAPED = re.compile(r"\\(.)")
+
+
+def _quote(field: str) -> str:
+    # Vehicle ids are free text from the UI: escape anything that would split the record
+    for char, escaped in _ESCAPES.items():
+        field = field.replace(char, escaped)
+    return field
+
+
+def _unquote(field: str) -> str:
+    return _ESCAPED.sub(lambda m: _UNESCAPES[m.group(1)], field)
+
+
+def _truncate_torn_tail(path: str) -> None:
+    """Drop everything after the last newline in `path` (the partial record of a crashed write)."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Tuple
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+WEEK_MS = 7 * DAY_MS
+
+ALL_DAYS: FrozenSet[int] = frozenset(range(7))  # 0 = Monday ... 6 = Sunday
+WEEKEND: FrozenSet[int] = frozenset({5, 6})
+
+
+@dataclass(frozen=True)
+class RateRule:
+    """`cents_per_hour` on `days` between start_minute (inclusive) and end_minute (exclusive) of local time."""
+    cents_per_hour: int
+    days: FrozenSet[int] = ALL_DAYS
+    start_minute: int = 0
+    end_minute: int = 24 * 60
+
+
+@dataclass(frozen=True)
+class TariffSchedule:
+    """
+    What a stay costs, before compiling.
+
+    - base_cents_per_hour, overridden by `rules` where they apply (a later rule wins over an earlier one),
+      e.g. RateRule(400, days=frozenset(range(5)), start_minute=7 * 60, end_minute=10 * 60) for weekday peak
+    - the first `free_minutes` of every stay are never billed: billing starts at entry + free_minutes
+    - from there the stay is billed in whole `billing_unit_minutes` (rounded up, at least `minimum_units`);
+      each unit is priced at the rates in force while it runs
+    - `grace_minutes`: stays of at most this long cost nothing, longer ones pay from billing start as usual
+    - `daily_cap_cents`: no 24h window (counted from billing start) costs more than this
+    - local time = UTC + utc_offset_minutes (fixed offset, no DST)
+    """
+    base_cents_per_hour: int
+    rules: Tuple[RateRule, ...] = field(default_factory=tuple)
+    billing_unit_minutes: int = 60
+    minimum_units: int = 1
+    free_minutes: int = 0
+    grace_minutes: int = 0
+    daily_cap_cents: Optional[int] = None
+    utc_offset_minutes: int = 0
+
+    @classmethod
+    def flat(cls, cents_per_hour: int) -> TariffSchedule:
+        """The original ParkingLot pricing: every started hour at one rate, minimum 1 hour."""
+        return cls(base_cents_per_hour=cents_per_hour)
+
+
+class Tariff:
+    """
+    A TariffSchedule compiled into one week of constant-rate segments with the cumulative price at each start.
+    The price of any interval is cum(exit) - cum(entry), each a binary search over the segments plus whole weeks,
+    so a stay of months costs the same to price as a stay of an hour.
+    With a daily cap, each 24h window is capped separately; windows repeat weekly, so at most 7 are priced.
+
+    Prices are kept in cent-milliseconds per hour (rate * ms) so every sum is exact; the fee is rounded up
+    to a whole cent once per stay (per window with a cap).
+    """
+
+    def __init__(self, schedule: TariffSchedule):
+        self._validate(schedule)
+        self.schedule = schedule
+        self._unit_ms = schedule.billing_unit_minutes * MINUTE_MS
+        self._free_ms = schedule.free_minutes * MINUTE_MS
+        self._grace_ms = schedule.grace_minutes * MINUTE_MS
+        self._offset_ms = schedule.utc_offset_minutes * MINUTE_MS
+
+        # Rate per minute of the week, then merged into segments where the rate changes
+        week = [schedule.base_cents_per_hour] * (7 * 24 * 60)
+        for rule in schedule.rules:
+            for day in rule.days:
+                start = day * 24 * 60
+                week[start + rule.start_minute:start + rule.end_minute] = (
+                    [rule.cents_per_hour] * (rule.end_minute - rule.start_minute)
+                )
+
+        self._starts: List[int] = []  # segment start, ms since Monday 00:00 local
+        self._rates: List[int] = []   # cents per hour in that segment
+        self._cum: List[int] = []     # cent-ms/hour accumulated from Monday 00:00 to the segment start
+        total = 0
+        for minute, rate in enumerate(week):
+            if self._rates and self._rates[-1] == rate:
+                continue
+            if self._starts:
+                total += self._rates[-1] * (minute * MINUTE_MS - self._starts[-1])
+            self._starts.append(minute * MINUTE_MS)
+            self._rates.append(rate)
+            self._cum.append(total)
+        self._week_total = total + self._rates[-1] * (WEEK_MS - self._starts[-1])
+
+        # Nothing to charge: lets exit_lot skip pricing entirely
+        self.free = self._week_total == 0
+
+    @property
+    def segments(self) -> Tuple[List[int], List[int], List[int], int]:
+        """(starts, rates, cumulative, week total), for vectorized pricing (see analytics.py)."""
+        return self._starts, self._rates, self._cum, self._week_total
+
+    def billed_interval(self, entry_ms: int, exit_ms: int) -> Optional[Tuple[int, int]]:
+        """
+        (start, end) of what is billed: from entry + free_minutes, whole units, at least minimum_units.
+        None when nothing is billed (stay within the free minutes or the grace period).
+        """
+        duration = exit_ms - entry_ms
+        start = entry_ms + self._free_ms
+        if (self._grace_ms and duration <= self._grace_ms) or (self._free_ms and exit_ms <= start):
+            return None
+        units = max(self.schedule.minimum_units, -(-(exit_ms - start) // self._unit_ms))
+        return start, start + units * self._unit_ms
+
+    def fee(self, entry_ms: int, exit_ms: int) -> int:
+        if exit_ms < entry_ms:
+            raise ValueError("Exit time cannot be earlier than entry time")
+        billed = self.billed_interval(entry_ms, exit_ms)
+        if billed is None:
+            return 0
+
+        start, end = billed
+        cap = self.schedule.daily_cap_cents
+        if cap is None:
+            return self._cents(self._cumulative(end) - self._cumulative(start))
+
+        full_days, rest = divmod(end - start, DAY_MS)
+        total = 0
+        if full_days:
+            # Window k starts k days after billing start; the same weekday comes back every 7 windows
+            window_fees = [
+                min(cap, self._cents(self._cumulative(start + (k + 1) * DAY_MS) - self._cumulative(start + k * DAY_MS)))
+                for k in range(min(full_days, 7))
+            ]
+            weeks, extra = divmod(full_days, 7)
+            total = weeks * sum(window_fees) + sum(window_fees[:extra])
+        if rest:
+            last_start = start + full_days * DAY_MS
+            total += min(cap, self._cents(self._cumulative(end) - self._cumulative(last_start)))
+        return total
+
+    def _cumulative(self, t_ms: int) -> int:
+        """Price accumulated from the (local) epoch week start up to t_ms."""
+        # Epoch (1970-01-01) was a Thursday: shift so week offset 0 is Monday 00:00 local
+        local = t_ms + self._offset_ms + 3 * DAY_MS
+        weeks, offset = divmod(local, WEEK_MS)
+        i = bisect_right(self._starts, offset) - 1
+        return weeks * self._week_total + self._cum[i] + self._rates[i] * (offset - self._starts[i])
+
+    @staticmethod
+    def _cents(rate_ms: int) -> int:
+        return -(-rate_ms // HOUR_MS)  # round up to a whole cent
+
+    @staticmethod
+    def _validate(schedule: TariffSchedule) -> None:
+        if schedule.base_cents_per_hour < 0:
+            raise ValueError("base_cents_per_hour cannot be negative")
+        if schedule.billing_unit_minutes < 1:
+            raise ValueError("billing_unit_minutes must be at least 1")
+        if schedule.minimum_units < 0 or schedule.free_minutes < 0 or schedule.grace_minutes < 0:
+            raise ValueError("minimum_units, free_minutes and grace_minutes cannot be negative")
+        if schedule.daily_cap_cents is not None and schedule.daily_cap_cents < 0:
+            raise ValueError("daily_cap_cents cannot be negative")
+        for rule in schedule.rules:
+            if rule.cents_per_hour < 0:
+                raise ValueError("cents_per_hour cannot be negative")
+            if not 0 <= rule.start_minute < rule.end_minute <= 24 * 60:
+                raise ValueError(f"Invalid rule window: {rule.start_minute}-{rule.end_minute}")
+            if not rule.days or not rule.days <= ALL_DAYS:
+                raise ValueError(f"Invalid rule days: {sorted(rule.days)}")
@@ -0,0 +1,99 @@
+"""Tariff.fee (and analytics.vectorized_fees) checked against a minute-by-minute brute-force pricer."""
+import random
+
+import pytest
+
+from tariff import DAY_MS, MINUTE_MS, WEEK_MS, WEEKEND, RateRule, Tariff, TariffSchedule
+
+PEAK = RateRule(600, days=frozenset(range(5)), start_minute=7 * 60, end_minute=10 * 60)
+WEEKEND_RATE = RateRule(150, days=WEEKEND)
+# Monday 2024-01-01 00:00 UTC
+MONDAY_MS = 1_704_067_200_000
+
+SCHEDULES = [
+    TariffSchedule.flat(500),
+    TariffSchedule(300, rules=(PEAK, WEEKEND_RATE)),
+    TariffSchedule(300, rules=(PEAK,), free_minutes=15, daily_cap_cents=3000),
+    TariffSchedule(300, rules=(PEAK, WEEKEND_RATE), billing_unit_minutes=15, minimum_units=2, grace_minutes=10),
+    TariffSchedule(250, rules=(WEEKEND_RATE,), free_minutes=30, grace_minutes=45, daily_cap_cents=1800,
+                   utc_offset_minutes=-300),
+]
+
+
+def brute_force_fee(schedule: TariffSchedule, entry_ms: int, exit_ms: int) -> int:
+    """Walk the billed interval one minute at a time (entry_ms must be on a whole minute)."""
+    duration = exit_ms - entry_ms
+    free_ms = schedule.free_minutes * MINUTE_MS
+    if schedule.grace_minutes and duration <= schedule.grace_minutes * MINUTE_MS:
+        return 0
+    if free_ms and duration <= free_ms:
+        return 0
+
+    start = entry_ms + free_ms
+    unit_ms = schedule.billing_unit_minutes * MINUTE_MS
+    units = max(schedule.minimum_units, -(-(exit_ms - start) // unit_ms))
+    minutes = units * unit_ms // MINUTE_MS
+
+    def rate_at(t_ms: int) -> int:
+        local = t_ms + schedule.utc_offset_minutes * MINUTE_MS
+        day = (local // DAY_MS + 3) % 7  # epoch was a Thursday
+        minute = local % DAY_MS // MINUTE_MS
+        rate = schedule.base_cents_per_hour
+        for rule in schedule.rules:
+            if day in rule.days and rule.start_minute <= minute < rule.end_minute:
+                rate = rule.cents_per_hour
+        return rate
+
+    def cents(rate_ms: int) -> int:
+        return -(-rate_ms // (60 * MINUTE_MS))
+
+    # cent-ms/hour per 24h window from billing start
+    windows = [0] * -(-minutes // (24 * 60))
+    for m in range(minutes):
+        windows[m // (24 * 60)] += rate_at(start + m * MINUTE_MS) * MINUTE_MS
+    if schedule.daily_cap_cents is None:
+        return cents(sum(windows))
+    return sum(min(schedule.daily_cap_cents, cents(w)) for w in windows)
+
+
+def random_stays(count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        entry = MONDAY_MS + rng.randrange(WEEK_MS // MINUTE_MS) * MINUTE_MS
+        length = rng.choice([rng.randrange(2 * 60 * MINUTE_MS), rng.randrange(3 * DAY_MS), rng.randrange(10 * DAY_MS)])
+        yield entry, entry + length
+
+
+@pytest.mark.parametrize("schedule", SCHEDULES)
+def test_fee_matches_brute_force(schedule):
+    tariff = Tariff(schedule)
+    for entry, exit_ in random_stays(300, seed=SCHEDULES.index(schedule)):
+        assert tariff.fee(entry, exit_) == brute_force_fee(schedule, entry, exit_), (entry, exit_)
+
+
+def test_free_minutes_are_never_billed():
+    tariff = Tariff(TariffSchedule(600, free_minutes=15))
+    assert tariff.fee(MONDAY_MS, MONDAY_MS + 15 * MINUTE_MS) == 0
+    # 16 minutes: one hour billed from minute 15, not from entry
+    assert tariff.fee(MONDAY_MS, MONDAY_MS + 16 * MINUTE_MS) == 600
+    assert tariff.billed_interval(MONDAY_MS, MONDAY_MS + 16 * MINUTE_MS) == (
+        MONDAY_MS + 15 * MINUTE_MS, MONDAY_MS + 75 * MINUTE_MS
+    )
+
+
+def test_grace_minutes_bill_from_entry():
+    tariff = Tariff(TariffSchedule(600, grace_minutes=15))
+    assert tariff.fee(MONDAY_MS, MONDAY_MS + 15 * MINUTE_MS) == 0
+    assert tariff.billed_interval(MONDAY_MS, MONDAY_MS + 16 * MINUTE_MS) == (MONDAY_MS, MONDAY_MS + 60 * MINUTE_MS)
+
+
+@pytest.mark.parametrize("schedule", SCHEDULES)
+def test_vectorized_fees_match_tariff(schedule):
+    np = pytest.importorskip("numpy")
+    from analytics import vectorized_fees
+
+    tariff = Tariff(schedule)
+    stays = list(random_stays(500, seed=7))
+    entry = np.array([e for e, _ in stays], dtype=np.int64)
+    exit_ = np.array([x for _, x in stays], dtype=np.int64)
+    assert vectorized_fees(tariff, entry, exit_).tolist() == [tariff.fee(e, x) for e, x in stays]
@@ -2,7 +2,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 
 # Import your backend (make sure parking_lot.py is in the same folder)
-from ParkingLot import ParkingLot, Level, ParkingSpot, Vehicle, VehicleType
+from ParkingLot import ParkingLot, Level, ParkingSpot, Vehicle, VehicleType, entrance_order_priority
+from journal import ParkingLotJournal
 
 
 # -------------------- UI App --------------------
@@ -251,7 +252,7 @@ class ParkingLotUI(tk.Tk):
 
         try:
             ticket = self.lot.entry_into_lot(Vehicle(vehicle_id, vehicle_type))
-            self.status_var.set(f"Parked {vehicle_type.value} '{vehicle_id}' at {ticket.parking_slot}. Ticket={ticket.id[:8]}...")
+            self.status_var.set(f"Parked {vehicle_type.value} '{vehicle_id}' at {self.lot.slot_of(ticket)}. Ticket={ticket.id[:8]}...")
             self._refresh_all()
         except Exception as e:
             messagebox.showerror("Entry Failed", str(e))
@@ -287,9 +288,9 @@ class ParkingLotUI(tk.Tk):
         try:
             fee = self.lot.exit_lot(ticket_obj)
             if fee > 0:
-                self.status_var.set(f"Exited '{ticket_obj.vehicle.id}'. Fee: {fee} cents. Spot freed: {ticket_obj.parking_slot}")
+                self.status_var.set(f"Exited '{ticket_obj.vehicle.id}'. Fee: {fee} cents. Spot freed: {self.lot.slot_of(ticket_obj)}")
             else:
-                self.status_var.set(f"Exited '{ticket_obj.vehicle.id}'. Spot freed: {ticket_obj.parking_slot}")
+                self.status_var.set(f"Exited '{ticket_obj.vehicle.id}'. Spot freed: {self.lot.slot_of(ticket_obj)}")
             self._refresh_all()
         except Exception as e:
             messagebox.showerror("Exit Failed", str(e))
@@ -313,7 +314,7 @@ class ParkingLotUI(tk.Tk):
             self._clear_vehicle_in_cell(slot)
 
         for ticket in self.lot.occupied_spot.values():
-            self._draw_vehicle_in_cell(ticket.parking_slot, ticket.vehicle.type, ticket.vehicle.id)
+            self._draw_vehicle_in_cell(self.lot.slot_of(ticket), ticket.vehicle.type, ticket.vehicle.id)
 
         # 3) Tickets list
         self.ticket_list.delete(0, tk.END)
@@ -325,14 +326,14 @@ class ParkingLotUI(tk.Tk):
 
         for idx, t in enumerate(tickets):
             short = t.id.split("-")[0]
-            txt = f"{short} | {t.vehicle.id} | {t.vehicle.type.value} | {t.parking_slot}"
+            txt = f"{short} | {t.vehicle.id} | {t.vehicle.type.value} | {self.lot.slot_of(t)}"
             self.ticket_list.insert(tk.END, txt)
             self._ticket_index_to_id[idx] = t.id
 
 
 # -------------------- Build a Demo Lot --------------------
 
-def build_demo_lot() -> ParkingLot:
+def build_demo_lot(journal: ParkingLotJournal | None = None) -> ParkingLot:
     """
     Creates a small multi-level lot:
     L1: 2 cars, 2 motorcycles, 1 truck
@@ -362,10 +363,19 @@ def build_demo_lot() -> ParkingLot:
     ]
 
     # hourly_rate_cents optional; keep 0 for demo or set like 500
-    return ParkingLot(parking_lot_levels=levels, hourly_rate_cents=0)
+    # Nearest free spot first (L1 before L2); drop spot_priority for the old LIFO behavior
+    return ParkingLot(
+        parking_lot_levels=levels,
+        hourly_rate_cents=0,
+        spot_priority=entrance_order_priority(levels),
+        journal=journal,
+    )
 
 
 if __name__ == "__main__":
-    lot = build_demo_lot()
+    # Parked vehicles survive restarts: state is journaled to ./parking_state (each entry/exit on disk before it returns)
+    journal = ParkingLotJournal("parking_state")
+    lot = build_demo_lot(journal)
     app = ParkingLotUI(lot)
     app.mainloop()
+    lot.close()